@@ -0,0 +1,92 @@
+"""Cache of our own admin rights per chat, so commands can fail fast"""
+import time
+from telethon import utils
+from telethon.errors import UserNotParticipantError
+from telethon.tl.functions.channels import GetParticipantRequest
+from telethon.tl.types import (
+    Channel, Chat, ChannelParticipantAdmin, ChannelParticipantCreator, InputPeerSelf,
+    PeerChannel, PeerChat, UpdateChannel, UpdateChannelParticipant, UpdateChatParticipantAdmin
+)
+
+RIGHTS = ('delete_messages', 'ban_users')  # The rights our commands need
+
+
+def rights_of(participant):
+    """Return the set of RIGHTS a channel participant record grants"""
+    if isinstance(participant, ChannelParticipantCreator):
+        return set(RIGHTS)
+    if isinstance(participant, ChannelParticipantAdmin):
+        return {right for right in RIGHTS if getattr(participant.admin_rights, right, False)}
+    return set()
+
+
+class AdminRightsCache:
+    """Our rights per chat ID, from our own participant record, with a TTL
+
+    Supergroups and channels take one GetParticipantRequest for ourselves.
+    Basic groups carry our rights on the Chat entity, so they cost nothing.
+    Entries are updated or dropped when participant/admin updates about
+    us arrive.
+    """
+    def __init__(self, ttl=600):
+        self.ttl = ttl
+        self.entries = {}  # chat_id -> (rights, expires_at)
+        self.hits = 0
+        self.misses = 0
+    
+    def get_cached(self, chat_id):
+        """Return the cached rights of a chat, or None if unknown or expired"""
+        entry = self.entries.get(chat_id)
+        if entry is None or entry[1] < time.monotonic():
+            return None
+        return entry[0]
+    
+    def remember(self, chat_id, rights):
+        self.entries[chat_id] = (rights, time.monotonic() + self.ttl)
+    
+    async def rights(self, client, chat, rpc=None):
+        """Return the set of RIGHTS we hold in a chat entity"""
+        chat_id = utils.get_peer_id(chat)
+        rights = self.get_cached(chat_id)
+        if rights is not None:
+            self.hits += 1
+            return rights
+        self.misses += 1
+        
+        if isinstance(chat, Channel):
+            request = GetParticipantRequest(chat, InputPeerSelf())
+            try:
+                result = await (rpc.call('participant', client, request) if rpc else client(request))
+                rights = rights_of(result.participant)
+            except UserNotParticipantError:
+                rights = set()
+        elif isinstance(chat, Chat):
+            if chat.creator:
+                rights = set(RIGHTS)
+            else:
+                rights = {right for right in RIGHTS if getattr(chat.admin_rights, right, False)}
+        else:
+            # Private chats have no admin rights to check
+            rights = set(RIGHTS)
+        self.remember(chat_id, rights)
+        return rights
+    
+    async def can(self, client, chat, right, rpc=None):
+        """Return True if we hold a right in a chat"""
+        return right in await self.rights(client, chat, rpc)
+    
+    def invalidate(self, chat_id):
+        """Forget a chat so its rights are resolved again on next use"""
+        self.entries.pop(chat_id, None)
+    
+    def handle_update(self, update, self_id):
+        """Apply a raw participant/admin update if it is about us"""
+        if isinstance(update, UpdateChannelParticipant):
+            if update.user_id == self_id:
+                self.remember(utils.get_peer_id(PeerChannel(update.channel_id)), rights_of(update.new_participant))
+        elif isinstance(update, UpdateChatParticipantAdmin):
+            if update.user_id == self_id:
+                self.invalidate(utils.get_peer_id(PeerChat(update.chat_id)))
+        elif isinstance(update, UpdateChannel):
+            # Sent for channel changes including our own rights; cheap to re-resolve
+            self.invalidate(utils.get_peer_id(PeerChannel(update.channel_id)))
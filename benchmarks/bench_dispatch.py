@@ -0,0 +1,78 @@
+"""Benchmark per-message command dispatch cost under a simulated message flood
+
+Usage: python benchmarks/bench_dispatch.py [messages_per_second] [seconds]
+"""
+import asyncio
+import os
+import random
+import re
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dispatcher import CommandDispatcher
+
+# The five patterns activate_bot used to register as separate handlers
+LEGACY_PATTERNS = [re.compile(p).match for p in (r'^/Aban$', r'^#NexoUnion$', r'^\.a$', r'^\.join', r'^\.left')]
+
+SAMPLE_TEXTS = [
+    'hello everyone', 'ok', 'https://t.me/somegroup', '😂😂', 'what time is the call?',
+    '.a', '.join https://t.me/a https://t.me/b', '#NexoUnion', '/start', '.', 'a' * 300,
+]
+
+
+def make_events(count, seed=0):
+    """Mostly incoming chatter with a few of our own commands mixed in"""
+    rng = random.Random(seed)
+    events = []
+    for _ in range(count):
+        out = rng.random() < 0.05
+        text = rng.choice(SAMPLE_TEXTS)
+        events.append(SimpleNamespace(out=out, chat_id=-1001, message=SimpleNamespace(message=text), pattern_match=None))
+    return events
+
+
+async def noop(event):
+    pass
+
+
+def make_dispatcher():
+    dispatcher = CommandDispatcher()
+    dispatcher.register('/Aban', r'^/Aban$', noop)
+    dispatcher.register('#NexoUnion', r'^#NexoUnion(?:\s+full)?$', noop)
+    dispatcher.register('.a', r'^\.a$', noop)
+    dispatcher.register('.join', r'^\.join', noop)
+    dispatcher.register('.left', r'^\.left', noop)
+    dispatcher.register('.sweep', r'^\.sweep(?:\s+(on|off))?$', noop)
+    return dispatcher
+
+
+async def legacy_dispatch(event):
+    for match in LEGACY_PATTERNS:
+        if match(event.message.message):
+            await noop(event)
+
+
+async def run(name, dispatch, events, rate):
+    start = time.perf_counter()
+    for event in events:
+        await dispatch(event)
+    elapsed = time.perf_counter() - start
+    per_message = elapsed / len(events)
+    budget = per_message * rate * 100
+    print(f"{name:<10} {per_message * 1e9:8.0f} ns/msg  {budget:6.2f}% of loop time at {rate} msgs/s")
+
+
+def main():
+    rate = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    seconds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    events = make_events(rate * seconds)
+    print(f"Dispatching {len(events)} messages ({seconds}s of flood at {rate} msgs/s)")
+    asyncio.run(run('legacy', legacy_dispatch, events, rate))
+    asyncio.run(run('dispatcher', make_dispatcher().dispatch, events, rate))
+
+
+if __name__ == '__main__':
+    main()
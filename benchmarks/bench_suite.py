@@ -0,0 +1,242 @@
+"""Offline benchmark suite: cleanup throughput, dispatch overhead, startup and memory
+
+Runs TelegramUserBot against FakeTelegramClient, so no account or network
+is needed, and compares the results with benchmarks/baseline.json.
+
+Usage: python benchmarks/bench_suite.py [--sizes 10000,100000,1000000] [--latency 0.0]
+                                        [--flood-every N] [--repeat 3] [--save-baseline] [--tolerance 0.25]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_client import FakeTelegramClient, SyntheticHistory
+from bench_dispatch import make_events
+from history_scan import LeanHistoryScanner
+from rpc_scheduler import RpcScheduler, MethodLimit, DEFAULT_LIMITS
+from sender_status import SenderStatusCache
+from service_rules import ServiceRuleTable
+from commands import cleanup
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+CHAT_ID = 4242
+
+
+class FakeStatusMessage:
+    async def edit(self, text):
+        pass
+    
+    async def delete(self):
+        pass
+
+
+class FakeEvent:
+    """The parts of a NewMessage event the command handlers use"""
+    def __init__(self, client, text, chat_id=CHAT_ID):
+        self.client = client
+        self.chat_id = chat_id
+        self.out = True
+        self.message = SimpleNamespace(message=text)
+        self.pattern_match = None
+        self.replies = []
+    
+    async def get_chat(self):
+        return self.client.channels[self.chat_id]
+    
+    async def get_input_chat(self):
+        return await self.client.get_input_entity(self.client.channels[self.chat_id])
+    
+    async def reply(self, text):
+        self.replies.append(text)
+        return FakeStatusMessage()
+
+
+def unthrottled_scheduler(metrics=None):
+    """A scheduler whose buckets never wait, so only local work and fake latency are timed"""
+    methods = set(DEFAULT_LIMITS) | {'participant', 'users', 'edit'}
+    limits = {method: MethodLimit(rate=1e9, max_rate=1e9, burst=1e9) for method in methods}
+    return RpcScheduler(limits, metrics=metrics)
+
+
+def make_bot(client):
+    """A TelegramUserBot wired to a fake client, with its files in the current directory"""
+    from main import TelegramUserBot
+    bot = TelegramUserBot()
+    bot.api_config['progress_linger'] = 0
+    bot.client = client
+    bot.current_account = 'bench'
+    bot.rpc = unthrottled_scheduler(bot.metrics)
+    return bot
+
+
+async def bench_cleanup(size, latency, flood_every):
+    """Run #NexoUnion end to end on a synthetic history, scanning all of it
+
+    The command only looks at the newest CLEANUP_SCAN_LIMIT messages, so
+    the limit is raised to the history size; otherwise every size would
+    time the same 10k-message run.
+    """
+    history = SyntheticHistory(CHAT_ID, size)
+    client = FakeTelegramClient([history], latency=latency, flood_every=flood_every)
+    bot = make_bot(client)
+    event = FakeEvent(client, '#NexoUnion full')
+    scan_limit, cleanup.CLEANUP_SCAN_LIMIT = cleanup.CLEANUP_SCAN_LIMIT, max(size, cleanup.CLEANUP_SCAN_LIMIT)
+    try:
+        start = time.perf_counter()
+        await cleanup.delete_service_messages(bot, event)
+        elapsed = time.perf_counter() - start
+    finally:
+        cleanup.CLEANUP_SCAN_LIMIT = scan_limit
+    scanned = bot.metrics.messages_scanned.get()
+    deleted = bot.metrics.messages_deleted.get(source='cleanup')
+    bot.state.close()
+    errors = [reply for reply in event.replies if reply.startswith('❌')]
+    if errors:
+        raise RuntimeError(f"cleanup failed: {errors[0]}")
+    print(f"cleanup   {size:>9} msgs  scanned {scanned} deleted {deleted} in {elapsed:.2f}s "
+          f"({scanned / elapsed:,.0f} scanned/s, {sum(client.calls.values())} requests)")
+    return scanned / elapsed
+
+
+async def bench_scan(size, latency):
+    """Scan a full history with the lean scanner; return (messages/s, peak MB)"""
+    history = SyntheticHistory(CHAT_ID, size)
+    client = FakeTelegramClient([history], latency=latency)
+    scanner = LeanHistoryScanner(client, ServiceRuleTable(), SenderStatusCache(), unthrottled_scheduler())
+    peer = await client.get_input_entity(client.channels[CHAT_ID])
+    
+    tracemalloc.start()
+    start = time.perf_counter()
+    scanned = matched = 0
+    async for ids, verdicts in scanner.scan(peer, windows=4):
+        scanned += len(ids)
+        matched += sum(1 for verdict in verdicts if verdict)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    print(f"scan      {size:>9} msgs  matched {matched} in {elapsed:.2f}s "
+          f"({scanned / elapsed:,.0f} msgs/s, peak {peak:.1f} MB)")
+    return scanned / elapsed, peak
+
+
+async def bench_dispatch(count=200_000):
+    """Per-message cost of the command dispatcher, with metrics enabled"""
+    from dispatcher import CommandDispatcher
+    from metrics import Metrics
+    
+    async def noop(event):
+        pass
+    
+    dispatcher = CommandDispatcher(Metrics())
+    for trigger, pattern in (('/Aban', r'^/Aban$'), ('#NexoUnion', r'^#NexoUnion(?:\s+full)?$'),
+                             ('.a', r'^\.a$'), ('.join', r'^\.join'), ('.left', r'^\.left'),
+                             ('.sweep', r'^\.sweep(?:\s+(on|off))?$'), ('.stats', r'^\.stats$')):
+        dispatcher.register(trigger, pattern, noop)
+    events = make_events(count)
+    start = time.perf_counter()
+    for event in events:
+        await dispatcher.dispatch(event)
+    per_message = (time.perf_counter() - start) / count * 1e9
+    print(f"dispatch  {count:>9} msgs  {per_message:.0f} ns/msg")
+    return per_message
+
+
+def bench_startup():
+    """Seconds to import main and construct TelegramUserBot, in a fresh interpreter"""
+    code = ("import time; t = time.perf_counter(); import main; t_import = time.perf_counter() - t; "
+            "t = time.perf_counter(); bot = main.TelegramUserBot(); bot.state.close(); "
+            "print(t_import, time.perf_counter() - t)")
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, env=env)
+    import_seconds, init_seconds = map(float, output.stdout.split()[-2:])
+    print(f"startup   import {import_seconds * 1000:.0f} ms, construct {init_seconds * 1000:.0f} ms")
+    return import_seconds, init_seconds
+
+
+def best(values, better):
+    return max(values) if better == 'higher' else min(values)
+
+
+async def run_suite(args):
+    """Run every benchmark args.repeat times and keep the best result of each"""
+    runs = {}
+    sizes = [int(size) for size in args.sizes.split(',')]
+    for _ in range(args.repeat):
+        results = {}
+        for size in sizes:
+            results[f'cleanup_{size}_scanned_per_s'] = (await bench_cleanup(size, args.latency, args.flood_every), 'higher')
+        for size in sizes:
+            rate, peak = await bench_scan(size, args.latency)
+            results[f'scan_{size}_msgs_per_s'] = (rate, 'higher')
+            results[f'scan_{size}_peak_mb'] = (peak, 'lower')
+        results['dispatch_ns_per_msg'] = (await bench_dispatch(), 'lower')
+        import_seconds, init_seconds = bench_startup()
+        results['startup_import_s'] = (import_seconds, 'lower')
+        results['startup_construct_s'] = (init_seconds, 'lower')
+        for name, (value, better) in results.items():
+            runs.setdefault(name, (better, []))[1].append(value)
+    return {name: (best(values, better), better) for name, (better, values) in runs.items()}
+
+
+def compare(results, baseline, tolerance):
+    """Print the change against the baseline; return the names that regressed"""
+    regressions = []
+    print(f"\n{'benchmark':<32} {'baseline':>12} {'now':>12} {'change':>8}")
+    for name, (value, better) in results.items():
+        if name not in baseline:
+            print(f"{name:<32} {'-':>12} {value:>12.4g}")
+            continue
+        old = baseline[name]['value']
+        change = (value - old) / old if old else 0
+        worse = -change if better == 'higher' else change
+        flag = '  REGRESSION' if worse > tolerance else ''
+        if flag:
+            regressions.append(name)
+        print(f"{name:<32} {old:>12.4g} {value:>12.4g} {change:>+7.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000', help="comma-separated history sizes")
+    parser.add_argument('--latency', type=float, default=0.0, help="fake seconds per request")
+    parser.add_argument('--flood-every', type=int, default=0, help="FloodWait on every Nth delete")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown before flagging")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per benchmark; the best one counts")
+    args = parser.parse_args()
+    
+    # The bot creates state.db in the working directory
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        results = asyncio.run(run_suite(args))
+    
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump({name: {'value': value, 'better': better} for name, (value, better) in results.items()},
+                      f, indent=4)
+        print(f"\nBaseline saved to {BASELINE_PATH}")
+        return
+    if not os.path.exists(BASELINE_PATH):
+        print("\nNo baseline yet; run with --save-baseline to store one")
+        return
+    with open(BASELINE_PATH) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
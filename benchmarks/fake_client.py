@@ -0,0 +1,235 @@
+"""Offline stand-in for TelegramClient with synthetic chat histories
+
+Implements the calls TelegramUserBot makes (iter_messages, delete_messages,
+get_entity, get_input_entity, iter_dialogs, get_me and the raw requests
+sent with client(...)) against in-memory histories, with configurable
+latency and simulated FloodWait errors.
+"""
+import asyncio
+import random
+from array import array
+from collections import Counter
+from types import SimpleNamespace
+
+from telethon.errors import FloodWaitError, UserNotParticipantError
+from telethon.tl.functions.channels import GetParticipantRequest, JoinChannelRequest, LeaveChannelRequest
+from telethon.tl.functions.messages import GetHistoryRequest, ImportChatInviteRequest
+from telethon.tl.functions.users import GetUsersRequest
+from telethon.tl.types import (
+    Channel, ChannelParticipantCreator, ChatPhotoEmpty, InputPeerChannel, InputPeerUser, Message,
+    MessageActionChatAddUser, MessageActionChatCreate, MessageActionChatDeleteUser,
+    MessageActionChatJoinedByLink, MessageService, PeerChannel, PeerUser, User,
+)
+
+SELF_ID = 1000
+DELETED_USER_ID = 666
+MEMBER_IDS = range(1, 101)
+
+# Message kinds stored per ID in SyntheticHistory.kinds
+TEXT, DELETED_ACCOUNT_TEXT, JOIN, LEAVE, ADD, LINK_JOIN, CREATE = range(7)
+SERVICE_ACTIONS = {
+    JOIN: lambda user_id: MessageActionChatAddUser(users=[user_id]),
+    ADD: lambda user_id: MessageActionChatAddUser(users=[user_id + 1]),
+    LEAVE: lambda user_id: MessageActionChatDeleteUser(user_id=user_id),
+    LINK_JOIN: lambda user_id: MessageActionChatJoinedByLink(inviter_id=user_id),
+    CREATE: lambda user_id: MessageActionChatCreate(title='bench', users=[user_id]),
+}
+
+
+class SyntheticHistory:
+    """A supergroup history of count messages, kept as one byte per message ID
+
+    Message objects are only built for the pages that are fetched, so a
+    million-message history costs about a megabyte until it is read.
+    """
+    def __init__(self, chat_id, count, service_ratio=0.3, deleted_ratio=0.05, seed=0):
+        self.chat_id = chat_id
+        self.count = count
+        rng = random.Random(seed)
+        service_kinds = (JOIN, LEAVE, ADD, LINK_JOIN)
+        kinds = array('b', [TEXT]) * (count + 1)  # Index 0 is unused; IDs start at 1
+        for message_id in range(2, count + 1):
+            roll = rng.random()
+            if roll < service_ratio:
+                kinds[message_id] = rng.choice(service_kinds)
+            elif roll < service_ratio + deleted_ratio:
+                kinds[message_id] = DELETED_ACCOUNT_TEXT
+        if count:
+            kinds[1] = CREATE
+        self.kinds = kinds
+        self.alive = bytearray(b'\x01') * (count + 1)
+        self.alive[0] = 0
+        self.peer = PeerChannel(chat_id)
+    
+    def sender(self, message_id):
+        if self.kinds[message_id] == DELETED_ACCOUNT_TEXT:
+            return DELETED_USER_ID
+        return MEMBER_IDS[message_id % len(MEMBER_IDS)]
+    
+    def message(self, message_id):
+        """Build the raw Message/MessageService for an ID"""
+        kind = self.kinds[message_id]
+        from_id = PeerUser(self.sender(message_id))
+        if kind in SERVICE_ACTIONS:
+            return MessageService(id=message_id, peer_id=self.peer, date=None,
+                                  action=SERVICE_ACTIONS[kind](from_id.user_id), from_id=from_id)
+        return Message(id=message_id, peer_id=self.peer, date=None, message='hello', from_id=from_id)
+    
+    def ids(self, offset_id=0, min_id=0, max_id=0, limit=100):
+        """Existing IDs with min_id < id < offset_id/max_id, newest first"""
+        upper = self.count + 1
+        for bound in (offset_id, max_id):
+            if bound:
+                upper = min(upper, bound)
+        ids = []
+        message_id = upper - 1
+        while message_id > min_id and len(ids) < limit:
+            if self.alive[message_id]:
+                ids.append(message_id)
+            message_id -= 1
+        return ids
+    
+    def delete(self, message_ids):
+        deleted = 0
+        for message_id in message_ids:
+            if 0 < message_id <= self.count and self.alive[message_id]:
+                self.alive[message_id] = 0
+                deleted += 1
+        return deleted
+    
+    def service_count(self):
+        """Number of live messages the default rules would delete"""
+        return sum(1 for message_id in range(2, self.count + 1)
+                   if self.alive[message_id] and self.kinds[message_id] != TEXT)
+
+
+def make_channel(chat_id, username=None):
+    return Channel(id=chat_id, title=f'bench {chat_id}', photo=ChatPhotoEmpty(), date=None,
+                   megagroup=True, access_hash=chat_id * 7, username=username)
+
+
+def make_user(user_id):
+    return User(id=user_id, access_hash=user_id * 7, first_name=f'user{user_id}',
+                deleted=user_id == DELETED_USER_ID, is_self=user_id == SELF_ID)
+
+
+class FakeTelegramClient:
+    """In-memory TelegramClient with per-call latency and simulated FloodWait
+
+    latency is slept before every call. flood_every=N makes every Nth call
+    of each method in flood_methods raise FloodWaitError(flood_seconds).
+    calls counts requests by method name.
+    """
+    def __init__(self, histories=(), dialogs=100, latency=0.0, flood_every=0, flood_seconds=1,
+                 flood_methods=('delete_messages',)):
+        self.histories = {history.chat_id: history for history in histories}
+        self.channels = {chat_id: make_channel(chat_id) for chat_id in self.histories}
+        for i in range(dialogs):
+            chat_id = 5000 + i
+            self.channels.setdefault(chat_id, make_channel(chat_id, username=f'benchgroup{i}'))
+        self.latency = latency
+        self.flood_every = flood_every
+        self.flood_seconds = flood_seconds
+        self.flood_methods = set(flood_methods)
+        self.calls = Counter()
+        self.joined = set()
+    
+    async def _call(self, method, request=None):
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.flood_every and method in self.flood_methods and self.calls[method] % self.flood_every == 0:
+            raise FloodWaitError(request, capture=self.flood_seconds)
+    
+    def _chat_id(self, peer):
+        for attribute in ('channel_id', 'chat_id', 'id'):
+            value = getattr(peer, attribute, None)
+            if value is not None:
+                return value
+        return peer
+    
+    async def connect(self):
+        pass
+    
+    async def disconnect(self):
+        pass
+    
+    async def is_user_authorized(self):
+        return True
+    
+    async def get_me(self):
+        await self._call('get_me')
+        return make_user(SELF_ID)
+    
+    async def get_entity(self, target):
+        await self._call('get_entity')
+        if isinstance(target, str):
+            username = target.rstrip('/').split('/')[-1].lstrip('@').lower()
+            for channel in self.channels.values():
+                if channel.username == username:
+                    return channel
+            raise ValueError(f'No user has "{username}" as username')
+        return self.channels[self._chat_id(target)]
+    
+    async def get_input_entity(self, peer):
+        if isinstance(peer, PeerUser):
+            return InputPeerUser(peer.user_id, peer.user_id * 7)
+        channel = self.channels[self._chat_id(peer)]
+        return InputPeerChannel(channel.id, channel.access_hash)
+    
+    async def iter_dialogs(self, limit=None):
+        await self._call('iter_dialogs')
+        for channel in list(self.channels.values())[:limit]:
+            yield SimpleNamespace(entity=channel, id=channel.id, name=channel.title)
+    
+    async def get_dialogs(self, limit=None):
+        return [dialog async for dialog in self.iter_dialogs(limit)]
+    
+    async def iter_messages(self, entity, limit=None, min_id=0, max_id=0):
+        history = self.histories[self._chat_id(entity)]
+        offset_id = 0
+        seen = 0
+        while limit is None or seen < limit:
+            await self._call('iter_messages')
+            ids = history.ids(offset_id, min_id, max_id, 100 if limit is None else min(100, limit - seen))
+            if not ids:
+                return
+            for message_id in ids:
+                yield history.message(message_id)
+            seen += len(ids)
+            offset_id = ids[-1]
+    
+    async def delete_messages(self, entity, message_ids):
+        await self._call('delete_messages')
+        if not isinstance(message_ids, (list, tuple)):
+            message_ids = [message_ids]
+        history = self.histories[self._chat_id(entity)]
+        return [SimpleNamespace(pts_count=history.delete(message_ids))]
+    
+    async def __call__(self, request):
+        if isinstance(request, GetHistoryRequest):
+            await self._call('GetHistoryRequest', request)
+            history = self.histories[self._chat_id(request.peer)]
+            ids = history.ids(request.offset_id, request.min_id, request.max_id, request.limit)
+            messages = [history.message(message_id) for message_id in ids]
+            senders = {message.from_id.user_id for message in messages}
+            return SimpleNamespace(messages=messages, users=[make_user(user_id) for user_id in senders], chats=[])
+        if isinstance(request, GetUsersRequest):
+            await self._call('GetUsersRequest', request)
+            return [make_user(user.user_id) for user in request.id]
+        if isinstance(request, GetParticipantRequest):
+            await self._call('GetParticipantRequest', request)
+            if self._chat_id(request.channel) not in self.histories:
+                raise UserNotParticipantError(request)
+            return SimpleNamespace(participant=ChannelParticipantCreator(user_id=SELF_ID, admin_rights=None))
+        if isinstance(request, (JoinChannelRequest, LeaveChannelRequest)):
+            await self._call(type(request).__name__, request)
+            channel = self.channels[self._chat_id(request.channel)]
+            (self.joined.add if isinstance(request, JoinChannelRequest) else self.joined.discard)(channel.id)
+            return SimpleNamespace(chats=[channel])
+        if isinstance(request, ImportChatInviteRequest):
+            await self._call('ImportChatInviteRequest', request)
+            channel = next(iter(self.channels.values()))
+            self.joined.add(channel.id)
+            return SimpleNamespace(chats=[channel])
+        raise NotImplementedError(f"FakeTelegramClient does not handle {type(request).__name__}")
@@ -0,0 +1,64 @@
+"""Chat command plugins, each module imported the first time one of its commands runs"""
+import importlib
+import time
+from logger import log
+
+
+class CommandSpec:
+    """A command's trigger, pattern and help text, and where its handler lives
+
+    target is 'module:function' inside this package; the function is
+    called as function(bot, event). job names the background job the
+    command runs as, or None to run it inline.
+    """
+    def __init__(self, trigger, pattern, target, usage=None, description='', job=None):
+        self.trigger = trigger
+        self.pattern = pattern
+        self.target = target
+        self.usage = usage
+        self.description = description
+        self.job = job
+
+
+COMMANDS = [
+    CommandSpec('/Aban', r'^/Aban$', 'ban:ban_all',
+                description="Ban all group members", job='ban'),
+    CommandSpec('#NexoUnion', r'^#NexoUnion(?:\s+full)?$', 'cleanup:delete_service_messages',
+                '#NexoUnion [full]', "Delete service messages (full = rescan all history)", job='cleanup'),
+    CommandSpec('.a', r'^\.a$', 'status:active_status',
+                description="Show active status"),
+    CommandSpec('.join', r'^\.join', 'groups:join_groups',
+                '.join [links]', "Join groups", job='join'),
+    CommandSpec('.left', r'^\.left', 'groups:leave_groups',
+                '.left [links]', "Leave groups", job='leave'),
+    CommandSpec('.jobs', r'^\.jobs$', 'status:list_jobs',
+                description="List running and recent jobs"),
+    CommandSpec('.stats', r'^\.stats$', 'status:stats',
+                description="Show latency, request and cache statistics"),
+    CommandSpec('.profile', r'^\.profile(?:\s+(\d+))?$', 'profile:profile',
+                '.profile [seconds]', "Sample where the bot spends CPU time and save a report"),
+    CommandSpec('.cancel', r'^\.cancel\s+#?(\d+)$', 'status:cancel_job',
+                '.cancel <id>', "Cancel a running job"),
+    CommandSpec('.sweep', r'^\.sweep(?:\s+(on|off))?$', 'cleanup:toggle_sweep',
+                '.sweep [on|off]', "Auto-delete join/leave messages in this chat"),
+]
+
+
+def load(target):
+    """Import a 'module:function' target from this package and return the function"""
+    module_name, function_name = target.split(':')
+    return getattr(importlib.import_module(f"{__name__}.{module_name}"), function_name)
+
+
+def lazy_handler(bot, target):
+    """Return an event handler that imports its plugin module on the first call"""
+    function = None
+    
+    async def handler(event):
+        nonlocal function
+        if function is None:
+            start = time.perf_counter()
+            function = load(target)
+            log.debug(f"Loaded {target} in {(time.perf_counter() - start) * 1000:.1f} ms", target=target)
+        await function(bot, event)
+    return handler
@@ -0,0 +1,43 @@
+"""The /Aban command"""
+
+
+async def ban_all(bot, event):
+    """Handle /Aban command - ban all group members"""
+    try:
+        chat = await event.get_chat()
+        
+        if not chat.megagroup and not hasattr(chat, 'participants_count'):
+            await event.reply("❌ This command only works in groups!")
+            return
+        
+        if not await bot.admin_rights.can(bot.client, chat, 'ban_users', bot.rpc):
+            await event.reply("❌ I don't have permission to ban members here!")
+            return
+        
+        me = await bot.get_identity()
+        participants = await bot.rpc.call('participants', bot.client.get_participants, chat)
+        
+        banned_count = 0
+        failed_count = 0
+        
+        progress = await bot.progress(event, f"🚫 Banning {len(participants)} members...",
+                                       total=len(participants), unit='members',
+                                       labels={'banned': "✅ Banned", 'failed': "❌ Failed"}).start()
+        
+        for done, participant in enumerate(participants, 1):
+            if participant.id == me.id:  # Don't ban ourselves
+                continue
+            
+            try:
+                await bot.rpc.call('kick', bot.client.kick_participant, chat, participant)
+                banned_count += 1
+            except Exception as e:
+                failed_count += 1
+                bot.logger(event).sampled('ban_failed', 'warning', f"Failed to ban {participant.id}: {str(e)}",
+                                           user=participant.id, error=str(e))
+            progress.update(done, banned=banned_count, failed=failed_count)
+        
+        await progress.finish(f"✅ Banned: {banned_count} | ❌ Failed: {failed_count}", keep=True)
+    
+    except Exception as e:
+        await event.reply(f"❌ Error: {str(e)}")
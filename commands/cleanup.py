@@ -0,0 +1,272 @@
+"""The #NexoUnion and .sweep commands, and the sweeper behind .sweep"""
+import asyncio
+from telethon.errors import MessageDeleteForbiddenError, MessageIdInvalidError
+from history_scan import LeanHistoryScanner, DELETE_BATCH_SIZE
+from service_rules import DELETE_SERVICE, DELETE_DELETED_ACCOUNT
+from logger import log
+
+SCAN_WINDOWS = 4  # Concurrent history windows when scanning supergroups and channels
+CLEANUP_SCAN_LIMIT = 10000  # Newest messages #NexoUnion looks at per run
+# Errors caused by single messages; any other error (FloodWait, lost admin
+# rights...) applies to the whole chat and would fail every retry as well
+PER_MESSAGE_ERRORS = (MessageDeleteForbiddenError, MessageIdInvalidError)
+
+
+class WatermarkStore:
+    """Persist the highest message ID already scanned per account and chat"""
+    def __init__(self, state):
+        self.state = state
+    
+    def get(self, account_name, chat_id):
+        """Return the last scanned message ID for a chat, or 0 if never scanned"""
+        return self.state.get('watermarks', account_name, {}).get(str(chat_id), 0)
+    
+    def set(self, account_name, chat_id, message_id):
+        """Record the last scanned message ID for a chat (never moves backwards)"""
+        chats = dict(self.state.get('watermarks', account_name, {}))
+        if message_id > chats.get(str(chat_id), 0):
+            chats[str(chat_id)] = message_id
+            self.state.set('watermarks', account_name, chats)
+    
+    def reset(self, account_name, chat_id):
+        """Forget the watermark for a chat so the next scan covers full history"""
+        chats = dict(self.state.get('watermarks', account_name, {}))
+        if chats.pop(str(chat_id), None) is not None:
+            self.state.set('watermarks', account_name, chats)
+
+
+class ServiceMessageSweeper:
+    """Delete join/leave service messages as they arrive, in small batches"""
+    def __init__(self, client, rpc, metrics, batch_size=DELETE_BATCH_SIZE, flush_interval=0.5):
+        self.client = client
+        self.rpc = rpc
+        self.metrics = metrics
+        self.batch_size = batch_size  # Flush as soon as this many IDs are buffered
+        self.flush_interval = flush_interval  # ...or this many seconds after the first one
+        self.buffers = {}  # chat_id -> [message_id, ...]
+        self.peers = {}  # chat_id -> input peer used for the delete call
+        self.timers = {}  # chat_id -> pending delayed flush task
+        self.tasks = set()  # Keep references to running flushes
+    
+    def add(self, chat_id, peer, message_id):
+        """Queue a service message for deletion"""
+        self.peers[chat_id] = peer
+        buffer = self.buffers.setdefault(chat_id, [])
+        buffer.append(message_id)
+        if len(buffer) >= self.batch_size:
+            timer = self.timers.pop(chat_id, None)
+            if timer:
+                timer.cancel()
+            self._spawn(self.flush(chat_id))
+        elif chat_id not in self.timers:
+            self.timers[chat_id] = self._spawn(self._flush_later(chat_id))
+    
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+    
+    async def _flush_later(self, chat_id):
+        await asyncio.sleep(self.flush_interval)
+        self.timers.pop(chat_id, None)
+        await self.flush(chat_id)
+    
+    async def flush(self, chat_id):
+        """Delete everything buffered for a chat with one bulk request"""
+        message_ids = self.buffers.pop(chat_id, [])
+        if not message_ids:
+            return
+        try:
+            await self.rpc.call('delete', self.client.delete_messages, self.peers[chat_id], message_ids)
+            self.metrics.messages_deleted.inc(len(message_ids), source='sweep')
+        except Exception as e:
+            log.sampled('sweep_failed', 'warning', f"Failed to sweep {len(message_ids)} service messages in {chat_id}: {str(e)}",
+                        chat=chat_id, messages=len(message_ids), error=str(e))
+    
+    async def close(self):
+        """Flush all buffered messages, e.g. before disconnecting"""
+        for timer in self.timers.values():
+            timer.cancel()
+        self.timers.clear()
+        for chat_id in list(self.buffers):
+            await self.flush(chat_id)
+
+
+async def delete_batch(bot, chat, batch):
+    """Delete a batch of (message_id, kind) pairs with a single bulk request
+
+    Return the number deleted, the IDs that could not be deleted, and
+    those of them worth retrying in a later run: everything except
+    messages refused for a reason of their own. Only a per-message error
+    makes it retry the batch one message at a time.
+    """
+    message_ids = [message_id for message_id, _ in batch]
+    deleted_count = 0
+    failed_ids = []
+    retry_ids = []
+    try:
+        await bot.rpc.call('delete', bot.client.delete_messages, chat, message_ids)
+        deleted_count = len(message_ids)
+        bot.metrics.messages_deleted.inc(deleted_count, source='cleanup')
+    except PER_MESSAGE_ERRORS as e:
+        bot.logger().sampled('bulk_delete_failed', 'warning',
+                              f"Bulk delete of {len(message_ids)} messages failed, retrying one by one: {str(e)}",
+                              chat=chat.id, messages=len(message_ids), error=str(e))
+        # Fall back to single deletes so one bad ID doesn't fail the whole batch
+        for index, (message_id, kind) in enumerate(batch):
+            try:
+                await bot.rpc.call('delete', bot.client.delete_messages, chat, [message_id])
+                deleted_count += 1
+                bot.metrics.messages_deleted.inc(source='cleanup')
+            except PER_MESSAGE_ERRORS as e:
+                failed_ids.append(message_id)
+                bot.logger().sampled('delete_failed', 'warning',
+                                      f"Failed to delete {kind} message {message_id}: {str(e)}",
+                                      chat=chat.id, message_id=message_id, kind=kind, error=str(e))
+            except Exception as e:
+                # The rest would fail the same way; give up on them
+                retry_ids = [message_id for message_id, _ in batch[index:]]
+                failed_ids.extend(retry_ids)
+                bot.logger().sampled('delete_failed', 'warning',
+                                      f"Failed to delete {len(batch) - index} messages: {str(e)}",
+                                      chat=chat.id, messages=len(batch) - index, error=str(e))
+                break
+    except Exception as e:
+        failed_ids = retry_ids = message_ids
+        bot.logger().sampled('bulk_delete_failed', 'warning',
+                              f"Bulk delete of {len(message_ids)} messages failed: {str(e)}",
+                              chat=chat.id, messages=len(message_ids), error=str(e))
+    return deleted_count, failed_ids, retry_ids
+
+
+def lowest_id(lowest, message_ids):
+    """Return the lowest of message_ids and lowest, which may be None"""
+    if lowest is not None:
+        message_ids = [*message_ids, lowest]
+    return min(message_ids, default=None)
+
+
+async def delete_service_messages(bot, event):
+    """Handle #NexoUnion command - delete service messages"""
+    try:
+        chat = await event.get_chat()
+        if not await bot.admin_rights.can(bot.client, chat, 'delete_messages', bot.rpc):
+            await event.reply("❌ I don't have permission to delete messages here!")
+            return
+        
+        resumed = bot.journal_progress(event)
+        deleted_count = resumed.get('deleted', 0)
+        failed_count = resumed.get('failed', 0)
+        lowest_retry = resumed.get('lowest_retry')  # Deletes that failed for now are retried by the next run
+        watermarks = WatermarkStore(bot.state)  # Last scanned message ID per chat
+        
+        if resumed:
+            # Continuing after a restart; a full rescan already reset the watermark
+            min_id = resumed['min_id']
+        else:
+            # Only scan history newer than the last run unless a full rescan is requested
+            full_scan = event.message.message.strip().lower().endswith('full')
+            if full_scan:
+                watermarks.reset(bot.current_account, event.chat_id)
+            min_id = watermarks.get(bot.current_account, event.chat_id)
+        rules = bot.service_rules.for_chat(event.chat_id)
+        highest_id = resumed.get('highest_id', 0)
+        
+        progress = await bot.progress(event, "🗑️ Deleting service messages...", unit='messages scanned',
+                                       labels={'deleted': "✅ Deleted", 'failed': "❌ Failed"}).start()
+        scanned_count = resumed.get('scanned', 0)
+        
+        # Matching IDs are buffered and flushed in bulk; each flush runs as a task
+        # so it overlaps with the scanner fetching the next page of history
+        scanner = LeanHistoryScanner(bot.client, rules, bot.sender_status, bot.rpc)
+        # Message IDs are only sequential in supergroups and channels, so only
+        # those can be split into ID windows and fetched concurrently
+        windows = SCAN_WINDOWS if getattr(chat, 'megagroup', False) or getattr(chat, 'broadcast', False) else 1
+        input_chat = await event.get_input_chat()
+        # Matches that were not deleted yet when the job was interrupted go first
+        buffer = [tuple(item) for item in resumed.get('pending', [])]
+        if resumed:
+            # Only the ID ranges the interrupted run had not scanned yet
+            pages = scanner.resume(input_chat, resumed['covered'], resumed['floor'], resumed.get('budget'))
+        else:
+            pages = scanner.scan(input_chat, min_id=min_id, limit=CLEANUP_SCAN_LIMIT, windows=windows)
+        pending = None
+        try:
+            async for ids, verdicts in pages:
+                highest_id = max(highest_id, ids[0])
+                scanned_count += len(ids)
+                bot.metrics.messages_scanned.inc(len(ids))
+                
+                # Service messages and messages from deleted accounts, as configured
+                for message_id, verdict in zip(ids, verdicts):
+                    if verdict == DELETE_SERVICE:
+                        buffer.append((message_id, 'service'))
+                    elif verdict == DELETE_DELETED_ACCOUNT:
+                        buffer.append((message_id, 'deleted account'))
+                
+                while len(buffer) >= DELETE_BATCH_SIZE:
+                    if pending:
+                        deleted, failed, retry = await pending
+                        deleted_count += deleted
+                        failed_count += len(failed)
+                        lowest_retry = lowest_id(lowest_retry, retry)
+                        # Everything matched in the pages scanned so far is now deleted or in the buffer
+                        bot.checkpoint(event, min_id=min_id, floor=scanner.floor, budget=scanner.budget,
+                                        highest_id=highest_id, covered=scanner.covered_ranges(),
+                                        pending=list(buffer), scanned=scanned_count,
+                                        deleted=deleted_count, failed=failed_count, lowest_retry=lowest_retry)
+                    pending = asyncio.create_task(delete_batch(bot, chat, buffer[:DELETE_BATCH_SIZE]))
+                    buffer = buffer[DELETE_BATCH_SIZE:]
+                
+                progress.update(scanned_count, deleted=deleted_count, failed=failed_count)
+            
+            if pending:
+                deleted, failed, retry = await pending
+                deleted_count += deleted
+                failed_count += len(failed)
+                lowest_retry = lowest_id(lowest_retry, retry)
+                pending = None
+            for start in range(0, len(buffer), DELETE_BATCH_SIZE):
+                deleted, failed, retry = await delete_batch(bot, chat, buffer[start:start + DELETE_BATCH_SIZE])
+                deleted_count += deleted
+                failed_count += len(failed)
+                lowest_retry = lowest_id(lowest_retry, retry)
+        finally:
+            if pending and not pending.done():
+                pending.cancel()
+        
+        # Remember how far we got so the next run only scans new messages,
+        # stopping just below any message that failed for now so it is tried
+        # again. Messages Telegram refuses to delete are not held back for.
+        if lowest_retry is not None:
+            highest_id = min(highest_id, lowest_retry - 1)
+        watermarks.set(bot.current_account, event.chat_id, highest_id)
+        
+        # Show the result in the status message and delete it after 2 seconds
+        await progress.finish(f"✅ Deleted {deleted_count} service messages! | ❌ Failed: {failed_count}")
+    
+    except Exception as e:
+        await event.reply(f"❌ Error: {str(e)}")
+
+
+async def toggle_sweep(bot, event):
+    """Handle .sweep command - toggle real-time service message cleanup"""
+    try:
+        mode = event.pattern_match.group(1)
+        if mode is None:
+            enabled = event.chat_id not in bot.get_sweep_chats()
+        else:
+            enabled = mode == 'on'
+        bot.set_sweep_chat(event.chat_id, enabled)
+        
+        state = "🟢 ON" if enabled else "🔴 OFF"
+        status_msg = await event.reply(f"🧹 Auto-sweep of join/leave messages: {state}")
+        await asyncio.sleep(2)
+        try:
+            await status_msg.delete()
+        except:
+            pass
+    
+    except Exception as e:
+        await event.reply(f"❌ Error: {str(e)}")
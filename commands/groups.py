@@ -0,0 +1,215 @@
+"""The .join and .left commands"""
+import re
+from telethon.errors import FloodWaitError
+from telethon.tl.functions.channels import JoinChannelRequest, LeaveChannelRequest
+from telethon.tl.functions.messages import ImportChatInviteRequest
+from dialog_index import DialogIndex
+
+
+async def resolve_username(bot, username):
+    """Resolve a public username to a peer, using the persistent peer cache"""
+    peer = bot.peer_cache.get(bot.current_account, 'username', username)
+    if peer is not None:
+        return peer
+    
+    try:
+        entity = await bot.rpc.call('resolve', bot.client.get_entity, username)
+    except Exception as e:
+        bot.logger().debug(f"Failed to get entity for {username}: {str(e)}", username=username, error=str(e))
+        # Try with @ prefix
+        try:
+            entity = await bot.rpc.call('resolve', bot.client.get_entity, f"@{username}")
+        except:
+            raise e
+    bot.peer_cache.put(bot.current_account, 'username', username, entity)
+    return entity
+
+
+def remember_invite(bot, invite_hash, result):
+    """Cache the chat an invite hash leads to, from a join result or an entity"""
+    chats = getattr(result, 'chats', None)
+    entity = chats[0] if chats else result
+    bot.peer_cache.put(bot.current_account, 'invite', invite_hash, entity)
+
+
+async def join_groups(bot, event):
+    """Handle .join command - join multiple groups"""
+    try:
+        message_text = event.message.message
+        # Extract group links from the message - improved regex to catch all t.me links
+        links = re.findall(r'(https?://t\.me/[^\s]+)', message_text)
+        
+        if not links:
+            await event.reply("❌ No valid group links found!\nUsage: .join https://t.me/group1 https://t.me/+invitelink")
+            return
+        
+        resumed = bot.journal_progress(event)
+        joined_count = resumed.get('joined', 0)
+        failed_count = resumed.get('failed', 0)
+        
+        progress = await bot.progress(event, f"🔗 Joining {len(links)} groups...", total=len(links),
+                                       unit='links', labels={'joined': "✅ Joined", 'failed': "❌ Failed"}).start()
+        logger = bot.logger(event)
+        
+        for done, link in enumerate(links, 1):
+            if done <= resumed.get('done', 0):
+                continue  # Handled before a restart
+            try:
+                logger.debug(f"Attempting to join: {link}", link=link)
+                
+                # Handle different types of Telegram links
+                if '/joinchat/' in link:
+                    # Old style invite links: https://t.me/joinchat/xxxxx
+                    logger.debug(f"Processing old style invite link: {link}", link=link)
+                    hash_part = link.split('/joinchat/')[-1]
+                    try:
+                        # Use the full link for join_chat
+                        result = await bot.rpc.call('join', bot.client.join_chat, link)
+                        logger.debug("Join result", link=link, result=result)
+                    except Exception as e:
+                        logger.debug(f"Failed with join_chat, trying alternative method: {str(e)}",
+                                     link=link, error=str(e))
+                        # Try importing the chat
+                        result = await bot.rpc.call('join', bot.client, ImportChatInviteRequest(hash_part))
+                        logger.debug("Import result", link=link, result=result)
+                    remember_invite(bot, hash_part, result)
+                elif '/+' in link:
+                    # New style private invite links: https://t.me/+xxxxx
+                    logger.debug(f"Processing new style invite link: {link}", link=link)
+                    hash_part = link.split('/+')[-1]
+                    try:
+                        # Use the full link for join_chat
+                        result = await bot.rpc.call('join', bot.client.join_chat, link)
+                        logger.debug("Join result", link=link, result=result)
+                    except Exception as e:
+                        logger.debug(f"Failed with join_chat, trying alternative method: {str(e)}",
+                                     link=link, error=str(e))
+                        # Try importing the chat with the hash
+                        result = await bot.rpc.call('join', bot.client, ImportChatInviteRequest(hash_part))
+                        logger.debug("Import result", link=link, result=result)
+                    remember_invite(bot, hash_part, result)
+                else:
+                    # Public username links: https://t.me/username
+                    username = link.split('/')[-1]
+                    # Remove any query parameters
+                    username = username.split('?')[0]
+                    logger.debug(f"Processing public username: {username}", link=link, username=username)
+                    
+                    entity = await resolve_username(bot, username)
+                    result = await bot.rpc.call('join', bot.client, JoinChannelRequest(entity))
+                    logger.debug("Join result", link=link, result=result)
+                
+                joined_count += 1
+                logger.info(f"Successfully joined: {link}", link=link)
+            
+            except Exception as e:
+                error_msg = str(e)
+                
+                # Handle specific error cases
+                if "USER_ALREADY_PARTICIPANT" in error_msg:
+                    logger.info(f"Already in group: {link}", link=link)
+                    joined_count += 1  # Count as success since we're already in
+                elif "INVITE_HASH_EXPIRED" in error_msg:
+                    logger.warning(f"Invite link expired: {link}", link=link, error=error_msg)
+                    failed_count += 1
+                elif "CHANNELS_TOO_MUCH" in error_msg:
+                    logger.warning(f"Too many channels joined: {link}", link=link, error=error_msg)
+                    failed_count += 1
+                elif isinstance(e, FloodWaitError):
+                    # The scheduler already waited and retried; this wait is too long to sit out
+                    logger.warning(f"Rate limited for {e.seconds}s, giving up on: {link}", link=link, error=error_msg)
+                    failed_count += 1
+                else:
+                    logger.warning(f"Failed to join {link}: {error_msg}", link=link, error=error_msg)
+                    failed_count += 1
+            
+            progress.update(done, joined=joined_count, failed=failed_count)
+            bot.checkpoint(event, done=done, joined=joined_count, failed=failed_count)
+        
+        # Show the result in the status message and delete it after 2 seconds
+        await progress.finish(f"✅ Joined: {joined_count} | ❌ Failed: {failed_count}")
+    
+    except Exception as e:
+        await event.reply(f"❌ Error: {str(e)}")
+
+
+async def leave_groups(bot, event):
+    """Handle .left command - leave multiple groups"""
+    try:
+        message_text = event.message.message
+        # Extract group links from the message
+        links = re.findall(r'(https?://t\.me/[^\s]+)', message_text)
+        
+        if not links:
+            await event.reply("❌ No valid group links found!\nUsage: .left https://t.me/group1 https://t.me/group2")
+            return
+        
+        resumed = bot.journal_progress(event)
+        left_count = resumed.get('left', 0)
+        failed_count = resumed.get('failed', 0)
+        
+        progress = await bot.progress(event, f"🚪 Leaving {len(links)} groups...", total=len(links),
+                                       unit='links', labels={'left': "✅ Left", 'failed': "❌ Failed"}).start()
+        
+        # Built on the first invite link that needs it, then shared by the rest
+        dialog_index = DialogIndex(bot.client, bot.peer_cache.invite_ids(bot.current_account), bot.rpc)
+        logger = bot.logger(event)
+        
+        for done, link in enumerate(links, 1):
+            if done <= resumed.get('done', 0):
+                continue  # Handled before a restart
+            try:
+                logger.debug(f"Attempting to leave: {link}", link=link)
+                
+                # Handle different types of links
+                if '/joinchat/' in link or '/+' in link:
+                    # For invite links, we need to get the chat first
+                    hash_part = link.split('/joinchat/' if '/joinchat/' in link else '/+')[-1].split('?')[0]
+                    try:
+                        # Try the cached chat for this invite, then chat info from the link
+                        chat = bot.peer_cache.get(bot.current_account, 'invite', hash_part)
+                        if chat is None:
+                            chat = await bot.rpc.call('resolve', bot.client.get_entity, link)
+                            remember_invite(bot, hash_part, chat)
+                        await bot.rpc.call('leave', bot.client, LeaveChannelRequest(chat))
+                        logger.info(f"Left invite link group: {link}", link=link)
+                    except Exception as e:
+                        logger.debug(f"Failed to leave invite link {link}: {str(e)}", link=link, error=str(e))
+                        bot.peer_cache.forget(bot.current_account, 'invite', hash_part)
+                        # Try alternative method - find the matching chat in the dialog index
+                        entity = await dialog_index.find(link, hash_part)
+                        if entity is None:
+                            raise e
+                        remember_invite(bot, hash_part, entity)
+                        await bot.rpc.call('leave', bot.client, LeaveChannelRequest(entity))
+                        logger.info(f"Left group via dialog search: {link}", link=link)
+                else:
+                    # Public username links
+                    username = link.split('/')[-1].split('?')[0]  # Remove query params
+                    logger.debug(f"Processing username: {username}", link=link, username=username)
+                    
+                    entity = await resolve_username(bot, username)
+                    await bot.rpc.call('leave', bot.client, LeaveChannelRequest(entity))
+                    logger.info(f"Left public group: {username}", link=link)
+                
+                left_count += 1
+            
+            except Exception as e:
+                error_msg = str(e)
+                
+                # Handle specific errors
+                if "USER_NOT_PARTICIPANT" in error_msg:
+                    # Don't count as failure since we're not in the group anyway
+                    logger.info(f"Not in group: {link}", link=link)
+                else:
+                    logger.warning(f"Failed to leave {link}: {error_msg}", link=link, error=error_msg)
+                    failed_count += 1
+            
+            progress.update(done, left=left_count, failed=failed_count)
+            bot.checkpoint(event, done=done, left=left_count, failed=failed_count)
+        
+        # Show the result in the status message and delete it after 2 seconds
+        await progress.finish(f"✅ Left: {left_count} | ❌ Failed: {failed_count}")
+    
+    except Exception as e:
+        await event.reply(f"❌ Error: {str(e)}")
@@ -0,0 +1,20 @@
+"""The .profile command"""
+import asyncio
+from profiler import SamplingProfiler
+
+MAX_PROFILE_SECONDS = 300  # Longest .profile run
+
+
+async def profile(bot, event):
+    """Handle .profile command - sample the event loop and write a report to profiles/"""
+    try:
+        seconds = min(int(event.pattern_match.group(1) or 30), MAX_PROFILE_SECONDS)
+        status = await event.reply(f"🔬 Profiling for {seconds}s...")
+        # Runs inline rather than as a job, so a long job in this chat does not hold it up.
+        # The handler runs on the event loop thread, so that is the thread sampled
+        profiler = await SamplingProfiler().run(seconds)
+        path = await asyncio.get_running_loop().run_in_executor(None, profiler.write)
+        await bot.rpc.call('edit', status.edit, f"🔬 **Profile** saved to `{path}`\n{profiler.summary()}")
+    
+    except Exception as e:
+        await event.reply(f"❌ Error: {str(e)}")
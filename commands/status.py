@@ -0,0 +1,61 @@
+"""Commands reporting on the bot: .a, .stats, .jobs and .cancel"""
+import asyncio
+
+
+async def active_status(bot, event):
+    """Handle .a command - show active status"""
+    try:
+        me = await bot.get_identity()
+        status = "🟢 ACTIVE" if bot.is_active else "🔴 INACTIVE"
+        
+        status_msg = await event.reply(f"**Userbot Status:** {status}\n"
+                        f"**User:** {me.first_name} {me.last_name or ''}\n"
+                        f"**Username:** @{me.username or 'None'}\n"
+                        f"**User ID:** {me.id}\n"
+                        f"**Peer cache:** {bot.peer_cache.stats()}")
+        
+        # Delete the status message after 2 seconds
+        await asyncio.sleep(2)
+        try:
+            await status_msg.delete()
+        except:
+            pass
+    
+    except Exception as e:
+        await event.reply(f"❌ Error: {str(e)}")
+
+
+async def stats(bot, event):
+    """Handle .stats command - summarise metrics"""
+    try:
+        await event.reply(f"**Stats:**\n{bot.metrics.summary()}\n**Rates:** {bot.rpc.stats()}\n"
+                          f"**Startup:** {bot.startup.summary()}")
+    
+    except Exception as e:
+        await event.reply(f"❌ Error: {str(e)}")
+
+
+async def list_jobs(bot, event):
+    """Handle .jobs command - list running and recent jobs"""
+    try:
+        jobs = list(bot.jobs.jobs.values())
+        if not jobs:
+            await event.reply("📭 No jobs")
+            return
+        await event.reply("**Jobs:**\n" + "\n".join(job.describe() for job in jobs))
+    
+    except Exception as e:
+        await event.reply(f"❌ Error: {str(e)}")
+
+
+async def cancel_job(bot, event):
+    """Handle .cancel command - cancel a running job"""
+    try:
+        job_id = int(event.pattern_match.group(1))
+        if bot.jobs.cancel(job_id):
+            await event.reply(f"🛑 Cancelled job #{job_id}")
+        else:
+            await event.reply(f"❌ No running job #{job_id}")
+    
+    except Exception as e:
+        await event.reply(f"❌ Error: {str(e)}")
@@ -0,0 +1,36 @@
+"""Console prompts that don't block the event loop"""
+import asyncio
+import threading
+
+
+def _resolve(future, result=None, error=None):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+async def ainput(prompt=''):
+    """Async input(): read one line in a daemon thread while the loop keeps running
+
+    Connected clients keep handling updates, pings and reconnects while
+    the prompt waits. The thread is a daemon so a pending prompt never
+    holds up exit. Raises EOFError when stdin is closed.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def read():
+        try:
+            result, error = input(prompt), None
+        except (EOFError, KeyboardInterrupt) as e:
+            result, error = None, e
+        try:
+            loop.call_soon_threadsafe(_resolve, future, result, error)
+        except RuntimeError:
+            pass  # The loop closed while we were waiting
+
+    threading.Thread(target=read, name='console-input', daemon=True).start()
+    return await future
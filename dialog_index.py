@@ -0,0 +1,46 @@
+"""One-pass index of the account's dialogs for link lookups"""
+
+
+class DialogIndex:
+    """Map usernames, chat IDs and known invite hashes to dialog entities
+
+    The dialog list is walked once, the first time a lookup needs it,
+    and every later lookup in the same command is a dict hit.
+    """
+    def __init__(self, client, invite_ids=None, rpc=None):
+        self.client = client
+        self.rpc = rpc
+        self.by_username = {}
+        self.by_id = {}
+        self.by_invite = dict(invite_ids or {})  # invite hash -> chat ID
+        self.built = False
+    
+    def add(self, entity):
+        """Index a single entity"""
+        self.by_id[entity.id] = entity
+        if getattr(entity, 'username', None):
+            self.by_username[entity.username.lower()] = entity
+        for extra in getattr(entity, 'usernames', None) or []:
+            self.by_username[extra.username.lower()] = entity
+    
+    async def build(self):
+        """Walk the dialog list once"""
+        if self.built:
+            return
+        if self.rpc is None:
+            dialogs = await self.client.get_dialogs(limit=None)
+        else:
+            dialogs = await self.rpc.call('dialogs', self.client.get_dialogs, limit=None)
+        for dialog in dialogs:
+            self.add(dialog.entity)
+        self.built = True
+    
+    async def find(self, link, invite_hash=None):
+        """Return the dialog entity a t.me link points to, or None"""
+        await self.build()
+        if invite_hash and invite_hash in self.by_invite:
+            entity = self.by_id.get(self.by_invite[invite_hash])
+            if entity is not None:
+                return entity
+        username = link.rstrip('/').split('/')[-1].split('?')[0].lower()
+        return self.by_username.get(username)
@@ -0,0 +1,61 @@
+"""Single entry point routing outgoing messages to chat commands"""
+import re
+import time
+from tracing import tracer
+
+
+class Command:
+    """A chat command: trigger word, full pattern and the coroutine handling it"""
+    def __init__(self, trigger, pattern, handler, usage, description):
+        self.trigger = trigger
+        self.pattern = re.compile(pattern)
+        self.handler = handler
+        self.usage = usage
+        self.description = description
+
+
+class CommandDispatcher:
+    """Route messages to commands with a prefix table instead of one regex per handler
+
+    Messages we didn't send, and messages not starting with a command
+    character, are rejected before any string splitting or regex work.
+    """
+    def __init__(self, metrics=None):
+        self.commands = {}  # trigger word -> Command
+        self.first_chars = set()
+        self.metrics = metrics
+    
+    def register(self, trigger, pattern, handler, usage=None, description=''):
+        """Register a command under its trigger word, e.g. '.join'"""
+        self.commands[trigger] = Command(trigger, pattern, handler, usage or trigger, description)
+        self.first_chars.add(trigger[0])
+    
+    def match(self, text):
+        """Return (command, match) for a message text, or (None, None)"""
+        if not text or text[0] not in self.first_chars:
+            return None, None
+        command = self.commands.get(text.split(None, 1)[0])
+        if command is None:
+            return None, None
+        match = command.pattern.match(text)
+        if match is None:
+            return None, None
+        return command, match
+    
+    async def dispatch(self, event):
+        """Handle a NewMessage event if it is one of our commands"""
+        if not event.out:
+            return
+        command, match = self.match(event.message.message)
+        if command is None:
+            return
+        event.pattern_match = match
+        with tracer.span('command', command.trigger, chat=event.chat_id):
+            if self.metrics is None:
+                await command.handler(event)
+                return
+            start = time.perf_counter()
+            try:
+                await command.handler(event)
+            finally:
+                self.metrics.command_seconds.observe(time.perf_counter() - start, command=command.trigger)
@@ -0,0 +1,221 @@
+"""Lean chat history scanning for #NexoUnion cleanup"""
+import asyncio
+from array import array
+from telethon.tl.functions.messages import GetHistoryRequest
+from telethon.tl.types import PeerUser
+
+PAGE_SIZE = 100  # Maximum messages Telegram returns per GetHistoryRequest
+DELETE_BATCH_SIZE = 100  # Telegram accepts at most 100 message IDs per delete call
+
+
+class LeanHistoryScanner:
+    """Page through raw chat history keeping only message IDs and rule verdicts
+
+    Pages are requested with GetHistoryRequest directly rather than
+    through iter_messages. Telethon still decodes each message into its
+    Message/MessageService types, but the entity map and the per-message
+    sender, chat and forward hydration (_finish_init) are skipped. Each
+    page is reduced to an array('q') of IDs and an array('b') of verdicts
+    from the rule table and the raw messages are dropped straight away.
+    
+    Sender status comes from the users bundled with each page. Any
+    sender missing from them is resolved in one batched lookup per page
+    through the shared SenderStatusCache.
+    
+    Requests go through the RpcScheduler when one is given.
+    
+    covered lists the ID ranges of every page handed to the caller, and
+    floor and budget the lowest ID and remaining message count scan() may
+    still reach, so an interrupted scan can continue with resume().
+    """
+    def __init__(self, client, rules, senders, rpc=None, page_size=PAGE_SIZE):
+        self.client = client
+        self.rules = rules
+        self.senders = senders
+        self.rpc = rpc
+        self.page_size = page_size
+        self.covered = []  # (low, high): every ID with low <= id < high (None = no bound) was yielded
+        self.floor = 0  # scan() never goes at or below this ID
+        self.budget = None  # Messages a count-limited scan() may still yield, None if not count-limited
+    
+    async def request(self, method, request):
+        if self.rpc is None:
+            return await self.client(request)
+        return await self.rpc.call(method, self.client, request)
+    
+    async def fetch_page(self, peer, offset_id, min_id):
+        """Fetch one page of messages with min_id < id < offset_id, newest first"""
+        result = await self.request('history', GetHistoryRequest(
+            peer=peer,
+            offset_id=offset_id,
+            offset_date=None,
+            add_offset=0,
+            limit=self.page_size,
+            max_id=0,
+            min_id=min_id,
+            hash=0
+        ))
+        deleted_senders = ()
+        if self.rules.delete_deleted_accounts:
+            sender_ids = {message.from_id.user_id for message in result.messages
+                          if isinstance(getattr(message, 'from_id', None), PeerUser)}
+            await self.senders.resolve(self.client, sender_ids, self.rpc, result.users)
+            deleted_senders = self.senders.deleted_among(sender_ids)
+        
+        ids = array('q')
+        verdicts = array('b')
+        classify = self.rules.classify_raw
+        for message in result.messages:
+            ids.append(message.id)
+            verdicts.append(classify(message, deleted_senders))
+        return ids, verdicts
+    
+    async def scan_window(self, peer, min_id=0, max_id=0, limit=None):
+        """Yield (ids, verdicts, upper) pages for min_id < id < max_id (0 = latest)
+
+        upper is the exclusive upper bound of the IDs the page accounts
+        for, or None for the newest page.
+        """
+        offset_id = max_id
+        seen = 0
+        while True:
+            ids, verdicts = await self.fetch_page(peer, offset_id, min_id)
+            if not ids:
+                return
+            if limit and seen + len(ids) >= limit:
+                keep = limit - seen
+                yield ids[:keep], verdicts[:keep], offset_id or None
+                return
+            yield ids, verdicts, offset_id or None
+            seen += len(ids)
+            offset_id = ids[-1]
+    
+    def gaps(self, floor=0):
+        """Return (min_id, max_id) ranges above floor that no yielded page covered"""
+        bounds = []
+        lower = floor  # Every ID up to here is covered or out of range
+        for low, high in sorted(self.covered, key=lambda span: span[0]):
+            if low > lower + 1:
+                bounds.append((lower, low))
+            if high is None:
+                return bounds
+            lower = max(lower, high - 1)
+        bounds.append((lower, 0))
+        return bounds
+    
+    def covered_ranges(self):
+        """Return covered merged into as few ranges as possible"""
+        merged = []
+        for low, high in sorted(self.covered, key=lambda span: span[0]):
+            if merged and merged[-1][1] is not None and low <= merged[-1][1]:
+                if high is None or high > merged[-1][1]:
+                    merged[-1][1] = high
+            else:
+                merged.append([low, high])
+        return merged
+    
+    async def scan(self, peer, min_id=0, limit=None, windows=1):
+        """Yield (ids, verdicts) pages for messages newer than min_id
+
+        With windows > 1, the ID range below the first page is split into
+        that many max_id/min_id windows which are fetched concurrently.
+        Pages then arrive out of order, and limit caps the ID span instead
+        of the message count. The two are the same in supergroups and
+        channels, where message IDs are sequential.
+        """
+        self.floor = min_id
+        if windows <= 1:
+            self.budget = limit
+            async for ids, verdicts, upper in self.scan_window(peer, min_id=min_id, limit=limit):
+                self.covered.append((ids[-1], upper))
+                if self.budget is not None:
+                    self.budget -= len(ids)
+                yield ids, verdicts
+            return
+        
+        # The first page tells us the newest ID, which bounds the windows
+        ids, verdicts = await self.fetch_page(peer, 0, min_id)
+        if not ids:
+            return
+        if limit and len(ids) >= limit:
+            self.floor = ids[limit - 1] - 1
+            self.covered.append((ids[limit - 1], None))
+            yield ids[:limit], verdicts[:limit]
+            return
+        self.covered.append((ids[-1], None))
+        yield ids, verdicts
+        if len(ids) < self.page_size:
+            return
+        top = ids[-1]
+        bottom = max(min_id, top - (limit - len(ids)) - 1) if limit else min_id
+        self.floor = bottom
+        if top - bottom <= 1:
+            return
+        
+        step = max(1, -(-(top - bottom) // windows))
+        edges = [max(bottom, top - i * step) for i in range(windows)] + [bottom]
+        bounds = []
+        for i in range(windows):
+            upper = edges[i] if i == 0 else edges[i] + 1
+            if upper - edges[i + 1] > 1:
+                bounds.append((edges[i + 1], upper))
+        async for page in self.scan_ranges(peer, bounds):
+            yield page
+    
+    async def resume(self, peer, covered, floor, budget=None):
+        """Yield the (ids, verdicts) pages an interrupted scan() had not reached yet
+
+        covered, floor and budget are the values the scanner had when it
+        was interrupted.
+        """
+        self.covered = [tuple(span) for span in covered]
+        self.floor = floor
+        self.budget = budget
+        if budget is None:
+            async for page in self.scan_ranges(peer, self.gaps(floor)):
+                yield page
+            return
+        # A count-limited scan pages newest first until its budget runs out
+        for lower, upper in reversed(self.gaps(floor)):
+            if self.budget <= 0:
+                return
+            async for ids, verdicts, page_upper in self.scan_window(peer, min_id=lower, max_id=upper,
+                                                                    limit=self.budget):
+                self.covered.append((ids[-1], page_upper))
+                self.budget -= len(ids)
+                yield ids, verdicts
+    
+    async def scan_ranges(self, peer, bounds):
+        """Yield (ids, verdicts) pages for several (min_id, max_id) ranges, fetched concurrently"""
+        if not bounds:
+            return
+        # A bounded queue limits how many pages are prefetched ahead of the consumer
+        queue = asyncio.Queue(maxsize=2 * len(bounds))
+        
+        async def worker(lower, upper):
+            # No await once cancelled: the queue may be full with nobody left to drain it
+            try:
+                async for page in self.scan_window(peer, min_id=lower, max_id=upper):
+                    await queue.put(page)
+            except Exception as e:
+                await queue.put(e)
+                return
+            await queue.put(None)
+        
+        tasks = [asyncio.create_task(worker(lower, upper)) for lower, upper in bounds]
+        finished = 0
+        try:
+            while finished < len(tasks):
+                page = await queue.get()
+                if page is None:
+                    finished += 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    # Recorded as the caller receives it, not when it was prefetched
+                    ids, verdicts, upper = page
+                    self.covered.append((ids[-1], upper))
+                    yield ids, verdicts
+        finally:
+            for task in tasks:
+                task.cancel()
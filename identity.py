@@ -0,0 +1,37 @@
+"""Snapshot of the logged-in user, kept in the state store"""
+from types import SimpleNamespace
+
+IDENTITY_FIELDS = ('id', 'first_name', 'last_name', 'username', 'phone')
+
+
+class IdentityCache:
+    """Our own user's id, name, username and phone, persisted per account
+
+    Hot paths read it instead of calling get_me(). It is refreshed at login
+    and from UpdateUserName/UpdateUserPhone updates.
+    """
+    def __init__(self, state, account_name):
+        self.state = state
+        self.account_name = account_name
+        self.data = dict(state.get('identity', account_name, {}))
+    
+    def save(self):
+        """Save the snapshot to the state store"""
+        self.state.set('identity', self.account_name, self.data)
+    
+    def snapshot(self):
+        """Return the cached identity with get_me()-style attributes, or None"""
+        if not self.data:
+            return None
+        return SimpleNamespace(**{field: self.data.get(field) for field in IDENTITY_FIELDS})
+    
+    def update_from_user(self, user):
+        """Replace the snapshot with a full User object"""
+        self.data = {field: getattr(user, field, None) for field in IDENTITY_FIELDS}
+        self.save()
+    
+    def update(self, **fields):
+        """Change some fields of the snapshot"""
+        if self.data:
+            self.data.update(fields)
+            self.save()
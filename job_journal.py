@@ -0,0 +1,116 @@
+"""Append-only journal of long-running jobs, so they can resume after a restart"""
+import json
+import os
+import time
+import uuid
+from types import SimpleNamespace
+
+RESUMABLE_JOBS = ('ban', 'cleanup', 'join', 'leave')
+
+
+class JobJournal:
+    """Record each job's command and progress as JSON lines
+
+    A job writes a 'start' record with its account, chat and command text,
+    a 'checkpoint' record with its full progress after every committed
+    batch, and an 'end' record when it finishes. Each record is flushed
+    before the job moves on, so a crash loses at most the batch in flight.
+    A line cut short by a crash is skipped on load. Once compact_every
+    records have been appended, the file is rewritten with one record per
+    unfinished job.
+    """
+    def __init__(self, path='jobs.journal', compact_every=1000):
+        self.path = path
+        self.compact_every = compact_every
+        self.jobs = {}  # journal ID -> entry of each unfinished job
+        self.records = 0
+        self.file = None
+        self.load()
+        self.compact()
+    
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                op = record.pop('op')
+                if op == 'start':
+                    self.jobs[record['id']] = record
+                elif op == 'checkpoint' and record['id'] in self.jobs:
+                    self.jobs[record['id']]['progress'] = record['progress']
+                elif op == 'end':
+                    self.jobs.pop(record['id'], None)
+    
+    def append(self, record):
+        self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self.file.flush()
+        self.records += 1
+        if self.records >= self.compact_every:
+            self.compact()
+    
+    def compact(self):
+        """Rewrite the journal with only the unfinished jobs and their latest progress"""
+        if self.file is not None:
+            self.file.close()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in self.jobs.values():
+                f.write(json.dumps({'op': 'start', **entry}, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self.records = len(self.jobs)
+    
+    def start(self, account_name, name, chat_id, text):
+        """Record a new job and return its entry"""
+        entry = {'id': uuid.uuid4().hex[:12], 'account': account_name, 'name': name, 'chat': chat_id,
+                 'text': text, 'started_at': time.time(), 'progress': {}}
+        self.jobs[entry['id']] = entry
+        self.append({'op': 'start', **entry})
+        return entry
+    
+    def checkpoint(self, entry, progress):
+        """Record a job's progress after a completed batch; progress must be JSON-serializable"""
+        if entry['id'] not in self.jobs:
+            return
+        entry['progress'] = progress
+        self.append({'op': 'checkpoint', 'id': entry['id'], 'progress': progress})
+    
+    def finish(self, entry):
+        """Record that a job finished, failed or was cancelled and must not resume"""
+        if self.jobs.pop(entry['id'], None) is not None:
+            self.append({'op': 'end', 'id': entry['id']})
+    
+    def unfinished(self, account_name):
+        """Return the entries of an account's jobs that did not finish, oldest first"""
+        return sorted((entry for entry in self.jobs.values() if entry['account'] == account_name),
+                      key=lambda entry: entry['started_at'])
+    
+    def close(self):
+        self.file.close()
+
+
+class ResumedEvent:
+    """Stands in for the NewMessage event of a journaled command when it resumes"""
+    def __init__(self, client, entry, pattern_match, rpc):
+        self.client = client
+        self.rpc = rpc
+        self.chat_id = entry['chat']
+        self.out = True
+        self.message = SimpleNamespace(message=entry['text'])
+        self.pattern_match = pattern_match
+        self.journal_entry = entry
+    
+    async def get_chat(self):
+        return await self.rpc.call('resolve', self.client.get_entity, self.chat_id)
+    
+    async def get_input_chat(self):
+        return await self.rpc.call('resolve', self.client.get_input_entity, self.chat_id)
+    
+    async def reply(self, text):
+        return await self.rpc.call('send', self.client.send_message, self.chat_id, text)
@@ -0,0 +1,107 @@
+"""Background jobs for long-running commands"""
+import asyncio
+import time
+from tracing import tracer
+
+
+class Job:
+    """A command running (or waiting to run) as a background task"""
+    def __init__(self, job_id, name, chat_id, key):
+        self.id = job_id
+        self.name = name
+        self.chat_id = chat_id
+        self.key = key
+        self.state = 'queued'
+        self.error = None
+        self.task = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+    
+    def describe(self):
+        """One-line summary for .jobs"""
+        if self.started_at is None:
+            elapsed = f"waiting {time.time() - self.created_at:.0f}s"
+        else:
+            elapsed = f"{(self.finished_at or time.time()) - self.started_at:.0f}s"
+        line = f"#{self.id} {self.name} in {self.chat_id} - {self.state} ({elapsed})"
+        if self.error:
+            line += f": {self.error}"
+        return line
+
+
+class JobManager:
+    """Run command work as tracked tasks with per-chat and global limits
+
+    A request identical to one already queued or running (same key) is
+    not started again; the existing job is returned instead.
+    """
+    def __init__(self, max_jobs=4, max_per_chat=1, history=20, metrics=None):
+        self.max_jobs = max_jobs
+        self.metrics = metrics
+        self.max_per_chat = max_per_chat
+        self.history = history  # Finished jobs kept around for .jobs
+        self.global_slots = asyncio.Semaphore(max_jobs)
+        self.chat_slots = {}  # chat_id -> Semaphore
+        self.jobs = {}  # job_id -> Job
+        self.by_key = {}  # key -> unfinished Job
+        self.next_id = 1
+    
+    def submit(self, name, chat_id, work, key=None):
+        """Start work() as a job; return (job, created)"""
+        key = key if key is not None else (name, chat_id)
+        existing = self.by_key.get(key)
+        if existing is not None:
+            return existing, False
+        
+        job = Job(self.next_id, name, chat_id, key)
+        self.next_id += 1
+        self.jobs[job.id] = job
+        self.by_key[key] = job
+        job.task = asyncio.create_task(self._run(job, work))
+        return job, True
+    
+    async def _run(self, job, work):
+        chat_slot = self.chat_slots.setdefault(job.chat_id, asyncio.Semaphore(self.max_per_chat))
+        try:
+            async with self.global_slots, chat_slot:
+                job.state = 'running'
+                job.started_at = time.time()
+                with tracer.span('job', job.name, job=job.id, chat=job.chat_id):
+                    await work()
+            job.state = 'done'
+        except asyncio.CancelledError:
+            job.state = 'cancelled'
+        except Exception as e:
+            job.state = 'failed'
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            if self.metrics and job.started_at is not None:
+                self.metrics.job_seconds.observe(job.finished_at - job.started_at, job=job.name, state=job.state)
+            self.by_key.pop(job.key, None)
+            self._prune()
+    
+    def _prune(self):
+        finished = [job for job in self.jobs.values() if job.finished_at is not None]
+        for job in finished[:-self.history]:
+            del self.jobs[job.id]
+    
+    def cancel(self, job_id):
+        """Cancel an unfinished job; return False if there is no such job"""
+        job = self.jobs.get(job_id)
+        if job is None or job.finished_at is not None:
+            return False
+        job.task.cancel()
+        return True
+    
+    async def cancel_all(self):
+        """Cancel every unfinished job and wait for them to stop"""
+        tasks = [job.task for job in self.jobs.values() if job.finished_at is None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def active(self):
+        """Return queued and running jobs"""
+        return [job for job in self.jobs.values() if job.finished_at is None]
@@ -0,0 +1,166 @@
+"""Structured logging written by a background thread, so slow output never blocks the loop"""
+import datetime
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+_STOP = object()
+
+
+class BoundLogger:
+    """A view of a Logger that adds fixed context (account, chat...) to every record"""
+    def __init__(self, logger, context):
+        self.logger = logger
+        self.context = context
+    
+    def bind(self, **context):
+        return BoundLogger(self.logger, {**self.context, **context})
+    
+    def log(self, level, message, **fields):
+        self.logger.log(level, message, **self.context, **fields)
+    
+    def debug(self, message, **fields):
+        self.log('debug', message, **fields)
+    
+    def info(self, message, **fields):
+        self.log('info', message, **fields)
+    
+    def warning(self, message, **fields):
+        self.log('warning', message, **fields)
+    
+    def error(self, message, **fields):
+        self.log('error', message, **fields)
+    
+    def sampled(self, key, level, message, **fields):
+        self.logger.sampled(key, level, message, **self.context, **fields)
+
+
+class Logger(BoundLogger):
+    """Leveled log records as JSON lines, formatted and written by one writer thread
+
+    log() only checks the level and puts a (time, level, message, fields)
+    tuple on a bounded queue; the writer thread formats it, prints it to
+    the console and appends it to a size-rotated file. If the writer falls
+    behind and the queue fills up, records are dropped and counted rather
+    than blocking the caller.
+    """
+    def __init__(self, level='info', path=None, console='text', max_bytes=5_000_000, backups=3,
+                 sample_every=20, queue_size=10_000):
+        super().__init__(self, {})
+        self.configure(level, path, console, max_bytes, backups, sample_every)
+        self.queue = queue.Queue(queue_size)
+        self.dropped = 0
+        self.samples = {}  # sample key -> occurrences so far
+        self.thread = None
+        self.file = None
+    
+    def configure(self, level='info', path=None, console='text', max_bytes=5_000_000, backups=3, sample_every=20):
+        """Apply logging options; console is 'text', 'json' or 'off'"""
+        if level not in LEVELS:
+            raise ValueError(f"Unknown log level: {level} (expected one of {', '.join(LEVELS)})")
+        if console not in ('text', 'json', 'off'):
+            raise ValueError(f"Unknown log console format: {console} (expected text, json or off)")
+        self.level = LEVELS[level]
+        self.path = path
+        self.console = console
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.sample_every = max(1, sample_every)
+    
+    def log(self, level, message, **fields):
+        if LEVELS[level] < self.level:
+            return
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._write_loop, name='log-writer', daemon=True)
+            self.thread.start()
+        try:
+            self.queue.put_nowait((time.time(), level, message, fields))
+        except queue.Full:
+            self.dropped += 1
+    
+    def sampled(self, key, level, message, **fields):
+        """Log only the 1st, (N+1)th, (2N+1)th... record for a key, with the running count
+
+        For per-message or per-item failures that can repeat thousands of
+        times in one command.
+        """
+        if LEVELS[level] < self.level:
+            return
+        count = self.samples.get(key, 0) + 1
+        self.samples[key] = count
+        if count % self.sample_every == 1 or self.sample_every == 1:
+            self.log(level, message, occurrences=count, **fields)
+    
+    def _write_loop(self):
+        dropped = 0
+        while True:
+            record = self.queue.get()
+            if record is _STOP:
+                self.queue.task_done()
+                break
+            try:
+                if self.dropped != dropped:
+                    self._write(time.time(), 'warning', f"Log queue full, dropped {self.dropped - dropped} records", {})
+                    dropped = self.dropped
+                self._write(*record)
+            except Exception as e:
+                sys.stderr.write(f"Logging failed: {str(e)}\n")
+            finally:
+                self.queue.task_done()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+    
+    def _write(self, timestamp, level, message, fields):
+        line = json.dumps({
+            'time': datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'level': level,
+            'message': message,
+            **fields,
+        }, ensure_ascii=False, default=str)
+        if self.console == 'json':
+            print(line, flush=True)
+        elif self.console == 'text':
+            print(message, flush=True)
+        if self.path:
+            if self.file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self.file = open(self.path, 'a', encoding='utf-8')
+            self.file.write(line + '\n')
+            self.file.flush()
+            if self.file.tell() >= self.max_bytes:
+                self._rotate()
+    
+    def _rotate(self):
+        """Shift log -> log.1 -> log.2 ..., keeping at most backups old files"""
+        self.file.close()
+        self.file = None
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+    
+    def flush(self):
+        """Block until everything queued so far is written, e.g. before printing a menu"""
+        if self.thread is not None:
+            self.queue.join()
+    
+    def close(self, timeout=5):
+        """Write out everything queued and stop the writer thread"""
+        if self.thread is None:
+            return
+        self.queue.put(_STOP)
+        self.thread.join(timeout)
+        self.thread = None
+
+
+log = Logger()
@@ -1,28 +1,75 @@
+import time
+STARTED_AT = time.perf_counter()  # Before the other imports, so startup timing includes them
+import argparse
 import asyncio
 import json
 import os
 import sys
-from telethon import TelegramClient, events
+from telethon import events, types
 from telethon.errors import SessionPasswordNeededError, PhoneCodeInvalidError, PasswordHashInvalidError
-from telethon.tl.functions.channels import JoinChannelRequest, LeaveChannelRequest
-from telethon.tl.functions.messages import DeleteHistoryRequest
-from telethon.tl.functions.account import UpdateProfileRequest, UpdateUsernameRequest
-from telethon.tl.functions.photos import DeletePhotosRequest, UploadProfilePhotoRequest
-from telethon.tl.types import MessageActionChatAddUser, MessageActionChatDeleteUser, MessageActionChatJoinedByLink, MessageActionChatMigrateTo, MessageActionChannelMigrateFrom
-import re
+from service_rules import ServiceRuleEngine, DELETE_SERVICE
+from dispatcher import CommandDispatcher
+from jobs import JobManager
+from identity import IdentityCache
+from state_store import StateStore, write_json_atomic
+from rpc_scheduler import RpcScheduler, MethodLimit, ScheduledClient
+from console import ainput
+from progress import ProgressReporter
+from metrics import Metrics, MetricsServer
+from logger import log
+from tracing import tracer
+from job_journal import JobJournal, ResumedEvent, RESUMABLE_JOBS
+from startup import StartupTimer
+from commands import COMMANDS, lazy_handler
+
+IMPORTED_AT = time.perf_counter()
 
 class TelegramUserBot:
     def __init__(self):
+        self.startup = StartupTimer(STARTED_AT)  # Time spent in each startup phase
+        self.startup.record('imports', IMPORTED_AT - STARTED_AT)
+        config_start = time.perf_counter()
         self.config_file = 'bot_config.json'
         self.api_config_file = 'config.json'
         self.client = None
         self.config = self.load_config()
         self.api_config = self.load_api_config()
+        self.configure_logging()
+        self.state = StateStore()  # Accounts, watermarks and identities
+        self.migrate_legacy_state()
+        from session_backend import SessionBackend
+        self.sessions = SessionBackend(  # Where Telethon keeps each account's session
+            self.api_config.get('session_backend', 'sqlite'),
+            snapshot_interval=self.api_config.get('session_snapshot_interval', 60)
+        )
         self.is_active = False
         self.accounts = {}  # Store multiple account clients
         self.current_account = None  # Currently active account
         self.logged_accounts = []  # List of logged in accounts
-        
+        self.sweeper = None  # Real-time service message sweeper for the active client, made on first use
+        self.dispatcher = None  # Routes our outgoing messages to command handlers
+        self.jobs = None  # Background jobs for long-running commands
+        self.journal = JobJournal()  # Progress of long-running jobs, for resuming after a restart
+        self.stopping = False  # Set while the bot stops, so interrupted jobs stay resumable
+        self.session_check_task = None  # Session checks still running after startup
+        self.background_tasks = set()  # Keep references to fire-and-forget tasks
+        self.service_rules = ServiceRuleEngine(self.config.get('service_rules'))  # Keep/delete rules per chat
+        from sender_status import SenderStatusCache
+        from peer_cache import PeerCache
+        from admin_rights import AdminRightsCache
+        self.sender_status = SenderStatusCache()  # Deleted-account flag per sender ID
+        self.peer_cache = PeerCache(self.state)  # Resolved usernames/invite hashes, shared by .join and .left
+        self.admin_rights = AdminRightsCache()  # Our delete/ban rights per chat
+        self.metrics = Metrics()  # Counters and histograms for .stats and /metrics
+        self.metrics.add_cache('peer', self.peer_cache)
+        self.metrics.add_cache('sender_status', self.sender_status)
+        self.metrics.add_cache('admin_rights', self.admin_rights)
+        self.metrics_server = None  # Optional local /metrics endpoint
+        self.rpc = RpcScheduler({  # Paces every request the command handlers make
+            method: MethodLimit(**limit) for method, limit in self.api_config.get('rpc_limits', {}).items()
+        }, metrics=self.metrics)
+        self.startup.record('config', time.perf_counter() - config_start)
+    
     def load_config(self):
         """Load configuration from JSON file"""
         if os.path.exists(self.config_file):
@@ -51,14 +98,48 @@ class TelegramUserBot:
                 return {}
         return {}
     
-    def save_config(self, config):
-        """Save configuration to JSON file"""
-        with open(self.config_file, 'w') as f:
-            json.dump(config, f, indent=4)
-        self.config = config
+    def configure_logging(self):
+        """Apply the log_* and trace_* options from config.json"""
+        log.configure(
+            level=self.api_config.get('log_level', 'info'),
+            path=self.api_config.get('log_file'),
+            console=self.api_config.get('log_console', 'text'),
+            max_bytes=self.api_config.get('log_max_bytes', 5_000_000),
+            backups=self.api_config.get('log_backups', 3),
+            sample_every=self.api_config.get('log_sample_every', 20)
+        )
+        tracer.configure(self.api_config.get('trace_file'), self.api_config.get('trace_max_bytes', 20_000_000))
+    
+    def logger(self, event=None):
+        """Return the log bound to the current account and, for a command, its chat"""
+        if event is None:
+            return log.bind(account=self.current_account)
+        return log.bind(account=self.current_account, chat=event.chat_id)
+    
+    def migrate_legacy_state(self):
+        """Move accounts, watermarks, identities and cached peers from the old files into the state store"""
+        accounts = self.config.pop('accounts', None)
+        if accounts is not None:
+            for account_name, account_data in accounts.items():
+                if self.state.get('accounts', account_name) is None:
+                    self.state.set('accounts', account_name, account_data)
+            self.state.flush()
+            # Only settings such as service_rules stay in bot_config.json
+            write_json_atomic(self.config_file, self.config)
+        self.state.import_json('watermarks', 'watermarks.json')
+        for account_name in self.state.items('accounts'):
+            self.state.import_json('identity', f"sessions/{account_name}_identity.json",
+                                   lambda data: {account_name: data})
+        from peer_cache import import_legacy_db
+        import_legacy_db(self.state)
+    
+    def save_account(self, account_name, account_data):
+        """Store an account's credentials and settings"""
+        self.state.set('accounts', account_name, account_data)
     
     def display_menu(self):
         """Display the main menu"""
+        log.flush()  # Keep queued log lines above the menu
         print("\n" + "="*50)
         print("         TELEGRAM USERBOT MENU")
         print("="*50)
@@ -77,39 +158,143 @@ class TelegramUserBot:
         print("="*50)
     
     async def check_existing_sessions(self):
-        """Check for existing sessions of all accounts"""
-        if 'accounts' not in self.config:
-            self.config['accounts'] = {}
-            self.save_config(self.config)
+        """Check for existing sessions of all accounts
         
-        print("🔍 Checking for existing account sessions...")
+        Sessions are validated concurrently, up to session_check_concurrency at
+        a time and each within session_check_timeout seconds (both read from
+        config.json). The first valid account in config order becomes the
+        active one: it is chosen as soon as it and every account listed
+        before it have been checked, and the rest keep validating in the
+        background as self.session_check_task.
+        """
+        log.info("🔍 Checking for existing account sessions...")
         
-        for account_name, account_data in self.config['accounts'].items():
+        limit = asyncio.Semaphore(self.api_config.get('session_check_concurrency', 5))
+        timeout = self.api_config.get('session_check_timeout', 15)
+        checks = {
+            account_name: asyncio.create_task(self.check_session(account_name, account_data, limit, timeout))
+            for account_name, account_data in self.state.items('accounts').items()
+        }
+        if not checks:
+            return
+        
+        self.session_check_task = asyncio.gather(*checks.values())
+        # A later account answering first must not take over, so wait in config order
+        for account_name, check in checks.items():
+            if await check:
+                if self.current_account is None:
+                    self.current_account = account_name
+                    self.client = self.accounts[account_name]['client']
+                break
+        
+        if not self.session_check_task.done():
+            log.info("⏳ Remaining sessions are still being checked in the background")
+    
+    async def check_session(self, account_name, account_data, limit, timeout):
+        """Validate one account's session and add it to the logged accounts; return True if valid"""
+        async with limit:
+            start = time.perf_counter()
+            client = None
             try:
-                session_file = f"sessions/{account_name}_session"
-                client = TelegramClient(session_file, account_data['api_id'], account_data['api_hash'])
-                await client.connect()
+                # FloodWaits of scheduled requests are left to the RPC scheduler
+                client = ScheduledClient(self.sessions.open(account_name), account_data['api_id'],
+                                         account_data['api_hash'])
+                identity = self.load_identity(account_name)
+                me = await asyncio.wait_for(self.validate_session(client, identity), timeout)
+                elapsed = time.perf_counter() - start
                 
-                if await client.is_user_authorized():
-                    me = await client.get_me()
+                if me is not None:
                     phone = me.phone if hasattr(me, 'phone') else 'Unknown'
                     self.accounts[account_name] = {
                         'client': client,
                         'phone': phone,
-                        'name': me.first_name or 'Unknown'
+                        'name': me.first_name or 'Unknown',
+                        'identity': identity
                     }
                     self.logged_accounts.append(account_name)
-                    print(f"✅ {account_name} ({phone}) - Session valid")
+                    log.info(f"✅ {account_name} ({phone}) - Session valid ({elapsed:.2f}s)",
+                             account=account_name, seconds=round(elapsed, 3))
+                    return True
                 else:
                     await client.disconnect()
-                    print(f"❌ {account_name} - Session expired")
+                    log.warning(f"❌ {account_name} - Session expired ({elapsed:.2f}s)",
+                                account=account_name, seconds=round(elapsed, 3))
+            except asyncio.CancelledError:
+                if client:
+                    await client.disconnect()
+                raise
+            except asyncio.TimeoutError:
+                log.warning(f"❌ {account_name} - Session check timed out after {timeout}s",
+                            account=account_name, seconds=timeout)
+                if client:
+                    await client.disconnect()
             except Exception as e:
-                print(f"❌ {account_name} - Session check failed: {str(e)}")
+                elapsed = time.perf_counter() - start
+                log.error(f"❌ {account_name} - Session check failed: {str(e)} ({elapsed:.2f}s)",
+                          account=account_name, seconds=round(elapsed, 3), error=str(e))
+                if client:
+                    await client.disconnect()
+    
+    async def validate_session(self, client, identity):
+        """Connect a client and return its user if the session is authorized
         
-        if self.logged_accounts:
-            self.current_account = self.logged_accounts[0]
-            self.client = self.accounts[self.current_account]['client']
-
+        On a warm restart the cached identity is returned straight away and
+        refreshed from get_me() in the background.
+        """
+        await client.connect()
+        if not await client.is_user_authorized():
+            return None
+        me = identity.snapshot()
+        if me is None:
+            me = await client.get_me()
+            identity.update_from_user(me)
+        else:
+            task = asyncio.create_task(self.refresh_identity(client, identity))
+            self.background_tasks.add(task)
+            task.add_done_callback(self.background_tasks.discard)
+        return me
+    
+    def load_identity(self, account_name):
+        """Return the identity cache of an account"""
+        return IdentityCache(self.state, account_name)
+    
+    async def refresh_identity(self, client, identity):
+        """Refresh a cached identity from the server"""
+        try:
+            identity.update_from_user(await client.get_me())
+        except Exception as e:
+            log.warning(f"⚠️ Could not refresh account info: {str(e)}", error=str(e))
+    
+    async def get_identity(self):
+        """Return the current account's user, from the identity cache when possible"""
+        identity = self.accounts.get(self.current_account, {}).get('identity')
+        me = identity.snapshot() if identity else None
+        if me is None:
+            me = await self.client.get_me()
+            if identity:
+                identity.update_from_user(me)
+        return me
+    
+    async def handle_self_update(self, event):
+        """Keep the current account's identity cache in sync with profile updates"""
+        identity = self.accounts.get(self.current_account, {}).get('identity')
+        if identity is None or getattr(event, 'user_id', None) != identity.data.get('id'):
+            return
+        if isinstance(event, types.UpdateUserName):
+            usernames = [u.username for u in event.usernames if u.active]
+            identity.update(first_name=event.first_name, last_name=event.last_name,
+                            username=usernames[0] if usernames else None)
+        elif isinstance(event, types.UpdateUserPhone):
+            identity.update(phone=event.phone)
+        else:
+            await self.refresh_identity(self.client, identity)
+    
+    async def handle_rights_update(self, event):
+        """Keep the admin rights cache in sync with participant/admin updates"""
+        identity = self.accounts.get(self.current_account, {}).get('identity')
+        if identity is not None:
+            self.admin_rights.handle_update(event, identity.data.get('id'))
+    
     async def add_account(self):
         """Add a new account"""
         print("\n--- ADD NEW ACCOUNT ---")
@@ -128,7 +313,7 @@ class TelegramUserBot:
         # Check if account already exists, if so, generate a unique name
         original_name = account_name
         counter = 1
-        while account_name in self.config.get('accounts', {}):
+        while self.state.get('accounts', account_name) is not None:
             account_name = f"{original_name}_{counter}"
             counter += 1
         
@@ -140,8 +325,7 @@ class TelegramUserBot:
         os.makedirs("sessions", exist_ok=True)
         
         # Initialize client for new account
-        session_file = f"sessions/{account_name}_session"
-        client = TelegramClient(session_file, api_id, api_hash)
+        client = ScheduledClient(self.sessions.open(account_name), api_id, api_hash)
         
         try:
             await client.connect()
@@ -149,35 +333,35 @@ class TelegramUserBot:
             if await client.is_user_authorized():
                 print("✅ Already logged in!")
                 me = await client.get_me()
+                identity = self.load_identity(account_name)
+                identity.update_from_user(me)
                 phone = me.phone if hasattr(me, 'phone') else 'Unknown'
                 
-                # Save account to config
-                if 'accounts' not in self.config:
-                    self.config['accounts'] = {}
-                self.config['accounts'][account_name] = {
+                # Save account to the state store
+                self.save_account(account_name, {
                     'api_id': api_id,
                     'api_hash': api_hash,
                     'phone': phone
-                }
-                self.save_config(self.config)
+                })
                 
                 # Add to active accounts
                 self.accounts[account_name] = {
                     'client': client,
                     'phone': phone,
-                    'name': me.first_name or 'Unknown'
+                    'name': me.first_name or 'Unknown',
+                    'identity': identity
                 }
                 self.logged_accounts.append(account_name)
                 self.current_account = account_name
                 self.client = client
                 
-                await self.update_profile(client)
+                await self.update_profile(client, identity)
                 print(f"✅ Account {account_name} added successfully!")
                 return True
             
             # Phone number input with retry
             for attempt in range(3):
-                phone = input(f"\nAttempt {attempt + 1}/3 - Enter your phone number (with country code): ").strip()
+                phone = (await ainput(f"\nAttempt {attempt + 1}/3 - Enter your phone number (with country code): ")).strip()
                 
                 if not phone:
                     print("❌ Phone number is required!")
@@ -200,7 +384,7 @@ class TelegramUserBot:
             # OTP verification with retry
             for attempt in range(3):
                 try:
-                    code = input(f"\nAttempt {attempt + 1}/3 - Enter the verification code: ").strip()
+                    code = (await ainput(f"\nAttempt {attempt + 1}/3 - Enter the verification code: ")).strip()
                     
                     if not code:
                         print("❌ Verification code is required!")
@@ -211,37 +395,37 @@ class TelegramUserBot:
                     
                     # Get user info
                     me = await client.get_me()
+                    identity = self.load_identity(account_name)
+                    identity.update_from_user(me)
                     user_phone = me.phone if hasattr(me, 'phone') else phone
                     
-                    # Save account to config
-                    if 'accounts' not in self.config:
-                        self.config['accounts'] = {}
-                    self.config['accounts'][account_name] = {
+                    # Save account to the state store
+                    self.save_account(account_name, {
                         'api_id': api_id,
                         'api_hash': api_hash,
                         'phone': user_phone
-                    }
-                    self.save_config(self.config)
+                    })
                     
                     # Add to active accounts
                     self.accounts[account_name] = {
                         'client': client,
                         'phone': user_phone,
-                        'name': me.first_name or 'Unknown'
+                        'name': me.first_name or 'Unknown',
+                        'identity': identity
                     }
                     self.logged_accounts.append(account_name)
                     self.current_account = account_name
                     self.client = client
                     
-                    await self.update_profile(client)
+                    await self.update_profile(client, identity)
                     print(f"✅ Account {account_name} added successfully!")
                     return True
-                    
+                
                 except SessionPasswordNeededError:
                     # 2FA required
                     for fa_attempt in range(3):
                         try:
-                            password = input(f"\n2FA Attempt {fa_attempt + 1}/3 - Enter your 2FA password: ").strip()
+                            password = (await ainput(f"\n2FA Attempt {fa_attempt + 1}/3 - Enter your 2FA password: ")).strip()
                             
                             if not password:
                                 print("❌ 2FA password is required!")
@@ -252,32 +436,32 @@ class TelegramUserBot:
                             
                             # Get user info
                             me = await client.get_me()
+                            identity = self.load_identity(account_name)
+                            identity.update_from_user(me)
                             user_phone = me.phone if hasattr(me, 'phone') else phone
                             
-                            # Save account to config
-                            if 'accounts' not in self.config:
-                                self.config['accounts'] = {}
-                            self.config['accounts'][account_name] = {
+                            # Save account to the state store
+                            self.save_account(account_name, {
                                 'api_id': api_id,
                                 'api_hash': api_hash,
                                 'phone': user_phone
-                            }
-                            self.save_config(self.config)
+                            })
                             
                             # Add to active accounts
                             self.accounts[account_name] = {
                                 'client': client,
                                 'phone': user_phone,
-                                'name': me.first_name or 'Unknown'
+                                'name': me.first_name or 'Unknown',
+                                'identity': identity
                             }
                             self.logged_accounts.append(account_name)
                             self.current_account = account_name
                             self.client = client
                             
-                            await self.update_profile(client)
+                            await self.update_profile(client, identity)
                             print(f"✅ Account {account_name} added successfully!")
                             return True
-                            
+                        
                         except PasswordHashInvalidError:
                             print("❌ Invalid 2FA password!")
                             if fa_attempt == 2:
@@ -291,7 +475,7 @@ class TelegramUserBot:
                                 return False
                     await client.disconnect()
                     return False
-                    
+                
                 except PhoneCodeInvalidError:
                     print("❌ Invalid verification code!")
                     if attempt == 2:
@@ -306,67 +490,29 @@ class TelegramUserBot:
             
             await client.disconnect()
             return False
-            
+        
         except Exception as e:
             print(f"❌ Connection error: {str(e)}")
             if client:
                 await client.disconnect()
             return False
     
-    async def update_profile(self, client=None):
-        """Update profile settings after login"""
+    async def update_profile(self, client=None, identity=None):
+        """Bring profile settings to the desired state after login"""
         if client is None:
             client = self.client
-            
+        
         try:
-            print("🔄 Updating profile settings...")
-            
-            # Update name to "UserBot @NexoUnion"
-            await client(UpdateProfileRequest(
-                first_name="UserBot @NexoUnion",
-                last_name="",
-                about=""
-            ))
-            print("✅ Profile name updated")
-            
-            # Remove username
-            try:
-                await client(UpdateUsernameRequest(username=""))
-                print("✅ Username removed")
-            except Exception as e:
-                print(f"⚠️ Could not remove username: {str(e)}")
-            
-            # Delete all existing profile photos
-            try:
-                photos = await client.get_profile_photos('me')
-                if photos:
-                    photo_ids = [photo.id for photo in photos]
-                    await client(DeletePhotosRequest(id=photo_ids))
-                    print(f"✅ Removed {len(photo_ids)} profile photos")
-            except Exception as e:
-                print(f"⚠️ Could not remove profile photos: {str(e)}")
-            
-            # Set new profile picture
-            picture_path = "pictures/ub1.png"
-            if os.path.exists(picture_path):
-                try:
-                    with open(picture_path, 'rb') as f:
-                        await client(UploadProfilePhotoRequest(
-                            file=await client.upload_file(f)
-                        ))
-                    print("✅ New profile picture set")
-                except Exception as e:
-                    print(f"⚠️ Could not set profile picture: {str(e)}")
+            log.info("🔄 Updating profile settings...")
+            from profile_sync import ProfileSync
+            applied = await ProfileSync(client, self.state, identity).sync()
+            if applied:
+                log.info("✅ Profile update completed")
             else:
-                print(f"⚠️ Profile picture not found at {picture_path}")
-                # Create pictures directory if it doesn't exist
-                os.makedirs("pictures", exist_ok=True)
-                print("📁 Created pictures directory - please add ub1.png file")
-            
-            print("✅ Profile update completed")
-            
+                log.info("✅ Profile already up to date")
+        
         except Exception as e:
-            print(f"❌ Profile update error: {str(e)}")
+            log.error(f"❌ Profile update error: {str(e)}", error=str(e))
     
     async def select_account(self):
         """Select which account to use"""
@@ -381,7 +527,7 @@ class TelegramUserBot:
             print(f"{i}) {account_name} ({account_info['phone']}) - {account_info['name']} {status}")
         
         try:
-            choice = int(input(f"\nSelect account (1-{len(self.logged_accounts)}): "))
+            choice = int(await ainput(f"\nSelect account (1-{len(self.logged_accounts)}): "))
             if 1 <= choice <= len(self.logged_accounts):
                 selected_account = self.logged_accounts[choice - 1]
                 self.current_account = selected_account
@@ -414,373 +560,210 @@ class TelegramUserBot:
             print("❌ Current account not authorized! Please select a valid account.")
             return
         
+        # One handler for all commands: non-outgoing and non-command messages are
+        # rejected before any regex runs
+        self.dispatcher = CommandDispatcher(self.metrics)
+        self.jobs = JobManager(metrics=self.metrics)
+        with self.startup.phase('handlers'):
+            for spec in COMMANDS:
+                # Plugin modules are imported by the first command that needs them
+                handler = lazy_handler(self, spec.target)
+                if spec.job:
+                    handler = self.run_as_job(spec.job, handler)
+                self.dispatcher.register(spec.trigger, spec.pattern, handler, spec.usage, spec.description)
+        
+        self.startup.report()
+        log.flush()  # Keep queued log lines above the command list
         print("✅ Userbot activated! Listening for commands...")
         print("\nAvailable commands:")
-        print("- /Aban : Ban all group members")
-        print("- #NexoUnion : Delete service messages")
-        print("- .a : Show active status")
-        print("- .join [links] : Join groups")
-        print("- .left [links] : Leave groups")
+        for command in self.dispatcher.commands.values():
+            print(f"- {command.usage} : {command.description}")
         print("\nPress Ctrl+C to stop the bot")
         
         self.is_active = True
         
         # Register event handlers
-        @self.client.on(events.NewMessage(pattern=r'^/Aban$'))
-        async def ban_all_members(event):
-            await self.handle_ban_all(event)
+        self.client.add_event_handler(self.dispatcher.dispatch, events.NewMessage())
+        
+        self.sweeper = None  # Made again for the new client on the first swept message
         
-        @self.client.on(events.NewMessage(pattern=r'^#NexoUnion$'))
-        async def delete_service_messages(event):
-            await self.handle_delete_service_messages(event)
+        if self.api_config.get('metrics_port') and self.metrics_server is None:
+            self.metrics_server = MetricsServer(self.metrics, self.api_config['metrics_port'])
+            await self.metrics_server.start()
         
-        @self.client.on(events.NewMessage(pattern=r'^\.a$'))
-        async def active_status(event):
-            await self.handle_active_status(event)
+        @self.client.on(events.ChatAction())
+        async def sweep_service_message(event):
+            await self.handle_chat_action(event)
         
-        @self.client.on(events.NewMessage(pattern=r'^\.join'))
-        async def join_groups(event):
-            await self.handle_join_groups(event)
+        self.client.add_event_handler(
+            self.handle_self_update,
+            events.Raw(types=[types.UpdateUserName, types.UpdateUserPhone, types.UpdateUser])
+        )
+        self.client.add_event_handler(
+            self.handle_rights_update,
+            events.Raw(types=[types.UpdateChannelParticipant, types.UpdateChatParticipantAdmin, types.UpdateChannel])
+        )
         
-        @self.client.on(events.NewMessage(pattern=r'^\.left'))
-        async def leave_groups(event):
-            await self.handle_leave_groups(event)
+        self.stopping = False
+        await self.resume_jobs()
         
         try:
             await self.client.run_until_disconnected()
         except KeyboardInterrupt:
             print("\n🛑 Bot stopped by user")
             self.is_active = False
+        finally:
+            self.stopping = True
+            await self.jobs.cancel_all()
+            if self.sweeper is not None:
+                await self.sweeper.close()
     
-    async def handle_ban_all(self, event):
-        """Handle /Aban command - ban all group members"""
-        try:
-            chat = await event.get_chat()
-            
-            if not chat.megagroup and not hasattr(chat, 'participants_count'):
-                await event.reply("❌ This command only works in groups!")
+    def run_as_job(self, name, handler):
+        """Wrap a command handler so it runs as a tracked background job"""
+        async def submit(event):
+            # Identical commands in the same chat are merged into the job already running
+            key = (name, event.chat_id, event.message.message)
+            job, created = self.jobs.submit(name, event.chat_id, lambda: handler(event), key)
+            if not created:
+                await event.reply(f"⏳ Already running as job #{job.id}")
                 return
-            
-            me = await self.client.get_me()
-            participants = await self.client.get_participants(chat)
-            
-            banned_count = 0
-            failed_count = 0
-            
-            await event.reply(f"🚫 Starting to ban {len(participants)} members...")
-            
-            for participant in participants:
-                if participant.id == me.id:  # Don't ban ourselves
-                    continue
-                
-                try:
-                    await self.client.kick_participant(chat, participant)
-                    banned_count += 1
-                    await asyncio.sleep(1)  # Rate limiting
-                except Exception as e:
-                    failed_count += 1
-                    print(f"Failed to ban {participant.id}: {str(e)}")
-            
-            await event.reply(f"✅ Banned: {banned_count} | ❌ Failed: {failed_count}")
-            
-        except Exception as e:
-            await event.reply(f"❌ Error: {str(e)}")
+            self.journal_job(job, name, event)
+        return submit
     
-    async def handle_delete_service_messages(self, event):
-        """Handle #NexoUnion command - delete service messages"""
-        try:
-            chat = await event.get_chat()
-            deleted_count = 0
-            
-            status_msg = await event.reply("🗑️ Starting to delete service messages...")
-            
-            async for message in self.client.iter_messages(chat, limit=10000):
-                # Delete all service messages by checking if message has action attribute
-                if hasattr(message, 'action') and message.action:
-                    try:
-                        await message.delete()
-                        deleted_count += 1
-                        await asyncio.sleep(0.3)  # Rate limiting
-                    except Exception as e:
-                        print(f"Failed to delete service message {message.id}: {str(e)}")
-                
-                # Also delete messages from deleted accounts (no sender)
-                elif message.from_id is None and hasattr(message, 'message') and message.message:
-                    try:
-                        await message.delete()
-                        deleted_count += 1
-                        await asyncio.sleep(0.3)
-                    except Exception as e:
-                        print(f"Failed to delete deleted account message {message.id}: {str(e)}")
-            
-            # Delete the initial status message
-            try:
-                await status_msg.delete()
-            except:
-                pass
-            
-            # Send completion message and delete it after 2 seconds
-            completion_msg = await event.reply(f"✅ Deleted {deleted_count} service messages!")
-            await asyncio.sleep(2)
-            try:
-                await completion_msg.delete()
-            except:
-                pass
-            
-        except Exception as e:
-            await event.reply(f"❌ Error: {str(e)}")
+    def journal_job(self, job, name, event):
+        """Record a resumable job in the job journal from the moment it is queued
+
+        The entry is finished when the job ends, unless the job was
+        cancelled because the bot is stopping; then it resumes on the next
+        start, whether it was running or still waiting for a slot.
+        """
+        if name not in RESUMABLE_JOBS:
+            return
+        entry = getattr(event, 'journal_entry', None)
+        if entry is None:
+            entry = event.journal_entry = self.journal.start(self.current_account, name, event.chat_id,
+                                                             event.message.message)
+        
+        def settle(task):
+            if not (self.stopping and job.state == 'cancelled'):
+                self.journal.finish(entry)
+        job.task.add_done_callback(settle)
     
-    async def handle_active_status(self, event):
-        """Handle .a command - show active status"""
-        try:
-            me = await self.client.get_me()
-            status = "🟢 ACTIVE" if self.is_active else "🔴 INACTIVE"
-            
-            status_msg = await event.reply(f"**Userbot Status:** {status}\n"
-                            f"**User:** {me.first_name} {me.last_name or ''}\n"
-                            f"**Username:** @{me.username or 'None'}\n"
-                            f"**User ID:** {me.id}")
-            
-            # Delete the status message after 2 seconds
-            await asyncio.sleep(2)
-            try:
-                await status_msg.delete()
-            except:
-                pass
-            
-        except Exception as e:
-            await event.reply(f"❌ Error: {str(e)}")
+    async def resume_jobs(self):
+        """Restart the current account's journaled jobs that were interrupted"""
+        for entry in self.journal.unfinished(self.current_account):
+            command, match = self.dispatcher.match(entry['text'])
+            if command is None:
+                self.journal.finish(entry)
+                continue
+            log.info(f"🔁 Resuming {entry['name']} in {entry['chat']}", account=self.current_account,
+                     chat=entry['chat'], job=entry['name'], progress=entry['progress'])
+            await command.handler(ResumedEvent(self.client, entry, match, self.rpc))
     
-    async def handle_join_groups(self, event):
-        """Handle .join command - join multiple groups"""
-        try:
-            message_text = event.message.message
-            # Extract group links from the message - improved regex to catch all t.me links
-            links = re.findall(r'(https?://t\.me/[^\s]+)', message_text)
-            
-            if not links:
-                await event.reply("❌ No valid group links found!\nUsage: .join https://t.me/group1 https://t.me/+invitelink")
-                return
-            
-            joined_count = 0
-            failed_count = 0
-            
-            status_msg = await event.reply(f"🔗 Attempting to join {len(links)} groups...")
-            
-            for link in links:
-                try:
-                    print(f"Attempting to join: {link}")
-                    
-                    # Handle different types of Telegram links
-                    if '/joinchat/' in link:
-                        # Old style invite links: https://t.me/joinchat/xxxxx
-                        print(f"Processing old style invite link: {link}")
-                        try:
-                            # Use the full link for join_chat
-                            result = await self.client.join_chat(link)
-                            print(f"Join result: {result}")
-                        except Exception as e:
-                            print(f"Failed with join_chat, trying alternative method: {str(e)}")
-                            # Try importing the chat
-                            from telethon.tl.functions.messages import ImportChatInviteRequest
-                            hash_part = link.split('/joinchat/')[-1]
-                            result = await self.client(ImportChatInviteRequest(hash_part))
-                            print(f"Import result: {result}")
-                    elif '/+' in link:
-                        # New style private invite links: https://t.me/+xxxxx
-                        print(f"Processing new style invite link: {link}")
-                        try:
-                            # Use the full link for join_chat
-                            result = await self.client.join_chat(link)
-                            print(f"Join result: {result}")
-                        except Exception as e:
-                            print(f"Failed with join_chat, trying alternative method: {str(e)}")
-                            # Try importing the chat with the hash
-                            from telethon.tl.functions.messages import ImportChatInviteRequest
-                            hash_part = link.split('/+')[-1]
-                            result = await self.client(ImportChatInviteRequest(hash_part))
-                            print(f"Import result: {result}")
-                    else:
-                        # Public username links: https://t.me/username
-                        username = link.split('/')[-1]
-                        # Remove any query parameters
-                        username = username.split('?')[0]
-                        print(f"Processing public username: {username}")
-                        
-                        try:
-                            # Try to get the entity first
-                            entity = await self.client.get_entity(username)
-                            result = await self.client(JoinChannelRequest(entity))
-                            print(f"Join result: {result}")
-                        except Exception as e:
-                            print(f"Failed to get entity for {username}: {str(e)}")
-                            # Try with @ prefix
-                            try:
-                                entity = await self.client.get_entity(f"@{username}")
-                                result = await self.client(JoinChannelRequest(entity))
-                                print(f"Join result with @ prefix: {result}")
-                            except:
-                                raise e
-                    
-                    joined_count += 1
-                    print(f"Successfully joined: {link}")
-                    await asyncio.sleep(2)  # Rate limiting
-                    
-                except Exception as e:
-                    error_msg = str(e)
-                    print(f"Failed to join {link}: {error_msg}")
-                    
-                    # Handle specific error cases
-                    if "USER_ALREADY_PARTICIPANT" in error_msg:
-                        print(f"Already in group: {link}")
-                        joined_count += 1  # Count as success since we're already in
-                    elif "INVITE_HASH_EXPIRED" in error_msg:
-                        print(f"Invite link expired: {link}")
-                        failed_count += 1
-                    elif "CHANNELS_TOO_MUCH" in error_msg:
-                        print(f"Too many channels joined: {link}")
-                        failed_count += 1
-                    elif "FLOOD_WAIT" in error_msg:
-                        print(f"Rate limited, waiting...")
-                        # Extract wait time and wait
-                        wait_time = int(re.search(r'(\d+)', error_msg).group(1)) if re.search(r'(\d+)', error_msg) else 60
-                        await asyncio.sleep(wait_time)
-                        # Retry once after waiting
-                        try:
-                            if '/joinchat/' in link or '/+' in link:
-                                await self.client.join_chat(link)
-                            else:
-                                username = link.split('/')[-1].split('?')[0]
-                                entity = await self.client.get_entity(username)
-                                await self.client(JoinChannelRequest(entity))
-                            joined_count += 1
-                        except:
-                            failed_count += 1
-                    else:
-                        failed_count += 1
-            
-            # Delete the initial status message
-            try:
-                await status_msg.delete()
-            except:
-                pass
-            
-            # Send completion message and delete it after 2 seconds
-            completion_msg = await event.reply(f"✅ Joined: {joined_count} | ❌ Failed: {failed_count}")
-            await asyncio.sleep(2)
-            try:
-                await completion_msg.delete()
-            except:
-                pass
-            
-        except Exception as e:
-            await event.reply(f"❌ Error: {str(e)}")
+    def journal_progress(self, event):
+        """Return the progress a resumed job had reached, or {} for a new one"""
+        entry = getattr(event, 'journal_entry', None)
+        return entry['progress'] if entry else {}
     
-    async def handle_leave_groups(self, event):
-        """Handle .left command - leave multiple groups"""
-        try:
-            message_text = event.message.message
-            # Extract group links from the message
-            links = re.findall(r'(https?://t\.me/[^\s]+)', message_text)
-            
-            if not links:
-                await event.reply("❌ No valid group links found!\nUsage: .left https://t.me/group1 https://t.me/group2")
-                return
-            
-            left_count = 0
-            failed_count = 0
-            
-            status_msg = await event.reply(f"🚪 Attempting to leave {len(links)} groups...")
-            
-            for link in links:
-                try:
-                    print(f"Attempting to leave: {link}")
-                    
-                    # Handle different types of links
-                    if '/joinchat/' in link or '/+' in link:
-                        # For invite links, we need to get the chat first
-                        try:
-                            # Try to get chat info from the link
-                            chat = await self.client.get_entity(link)
-                            await self.client(LeaveChannelRequest(chat))
-                            print(f"Left invite link group: {link}")
-                        except Exception as e:
-                            print(f"Failed to leave invite link {link}: {str(e)}")
-                            # Try alternative method - get all dialogs and find matching chat
-                            async for dialog in self.client.iter_dialogs():
-                                if hasattr(dialog.entity, 'username') and dialog.entity.username:
-                                    if f"t.me/{dialog.entity.username}" in link:
-                                        await self.client(LeaveChannelRequest(dialog.entity))
-                                        print(f"Left group via dialog search: {link}")
-                                        break
-                            else:
-                                raise e
-                    else:
-                        # Public username links
-                        username = link.split('/')[-1].split('?')[0]  # Remove query params
-                        print(f"Processing username: {username}")
-                        
-                        try:
-                            entity = await self.client.get_entity(username)
-                            await self.client(LeaveChannelRequest(entity))
-                            print(f"Left public group: {username}")
-                        except Exception as e:
-                            print(f"Failed to get entity for {username}: {str(e)}")
-                            # Try with @ prefix
-                            try:
-                                entity = await self.client.get_entity(f"@{username}")
-                                await self.client(LeaveChannelRequest(entity))
-                                print(f"Left group with @ prefix: @{username}")
-                            except:
-                                raise e
-                    
-                    left_count += 1
-                    await asyncio.sleep(2)  # Rate limiting
-                    
-                except Exception as e:
-                    failed_count += 1
-                    error_msg = str(e)
-                    print(f"Failed to leave {link}: {error_msg}")
-                    
-                    # Handle specific errors
-                    if "USER_NOT_PARTICIPANT" in error_msg:
-                        print(f"Not in group: {link}")
-                        # Don't count as failure since we're not in the group anyway
-                        failed_count -= 1
-            
-            # Delete the initial status message
-            try:
-                await status_msg.delete()
-            except:
-                pass
-            
-            # Send completion message and delete it after 2 seconds
-            completion_msg = await event.reply(f"✅ Left: {left_count} | ❌ Failed: {failed_count}")
-            await asyncio.sleep(2)
+    def checkpoint(self, event, **progress):
+        """Record a job's progress after a completed batch, if the job is journaled"""
+        entry = getattr(event, 'journal_entry', None)
+        if entry is not None:
+            self.journal.checkpoint(entry, progress)
+    
+    def progress(self, event, title, **options):
+        """Return a progress reporter for a long-running command"""
+        return ProgressReporter(event, title, interval=self.api_config.get('progress_interval', 3),
+                                linger=self.api_config.get('progress_linger', 2), rpc=self.rpc, **options)
+    
+    def get_sweep_chats(self):
+        """Return the chat IDs with real-time sweeping enabled for the current account"""
+        account = self.state.get('accounts', self.current_account, {})
+        return account.get('sweep_chats', [])
+    
+    def set_sweep_chat(self, chat_id, enabled):
+        """Enable or disable real-time sweeping for a chat and persist it"""
+        account = dict(self.state.get('accounts', self.current_account, {}))
+        sweep_chats = list(account.get('sweep_chats', []))
+        if enabled and chat_id not in sweep_chats:
+            sweep_chats.append(chat_id)
+        elif not enabled and chat_id in sweep_chats:
+            sweep_chats.remove(chat_id)
+        account['sweep_chats'] = sweep_chats
+        self.save_account(self.current_account, account)
+    
+    async def handle_chat_action(self, event):
+        """Queue join/leave/add/remove service messages in swept chats for deletion"""
+        if event.chat_id not in self.get_sweep_chats():
+            return
+        if not (event.user_joined or event.user_added or event.user_left or event.user_kicked):
+            return
+        if event.action_message is None:
+            return
+        if self.service_rules.for_chat(event.chat_id).classify(event.action_message) != DELETE_SERVICE:
+            return
+        if not await self.admin_rights.can(self.client, await event.get_chat(), 'delete_messages', self.rpc):
+            return
+        if self.sweeper is None:
+            from commands.cleanup import ServiceMessageSweeper
+            self.sweeper = ServiceMessageSweeper(self.client, self.rpc, self.metrics)
+        self.sweeper.add(event.chat_id, await event.get_input_chat(), event.action_message.id)
+    
+    async def select_account_by_name(self, account_name):
+        """Make a named account active, waiting for its session check if needed"""
+        if account_name not in self.logged_accounts and self.session_check_task:
+            await asyncio.gather(self.session_check_task, return_exceptions=True)
+        if account_name not in self.logged_accounts:
+            log.error(f"❌ No valid session for account {account_name}", account=account_name)
+            return False
+        self.current_account = account_name
+        self.client = self.accounts[account_name]['client']
+        return True
+    
+    async def shutdown(self):
+        """Stop background session checks and the metrics endpoint, disconnect all clients and save sessions"""
+        if self.session_check_task:
+            self.session_check_task.cancel()
+        if self.metrics_server:
+            await self.metrics_server.close()
+        for account_name, account_info in self.accounts.items():
             try:
-                await completion_msg.delete()
+                await account_info['client'].disconnect()
             except:
                 pass
-            
-        except Exception as e:
-            await event.reply(f"❌ Error: {str(e)}")
+        self.sessions.close()
     
-    async def run(self):
-        """Main run loop"""
+    async def run(self, account_name=None, headless=False):
+        """Main run loop
+        
+        account_name picks the account to activate instead of the first
+        valid one. In headless mode no menu is shown: the bot activates
+        straight away, or returns False if there is no valid account.
+        """
         # Check for existing sessions on startup
-        await self.check_existing_sessions()
+        self.sessions.start()
+        with self.startup.phase('sessions'):
+            await self.check_existing_sessions()
+        
+        if account_name and not await self.select_account_by_name(account_name):
+            if headless:
+                return False
         
         # If accounts are already logged in, automatically activate the bot
         if self.logged_accounts and self.current_account:
-            print(f"\n✅ Found existing logged-in account: {self.current_account}")
-            print("🚀 Automatically activating bot...")
+            log.info(f"✅ Found existing logged-in account: {self.current_account}", account=self.current_account)
+            log.info("🚀 Automatically activating bot...")
             await self.activate_bot()
-            return  # Exit after bot is deactivated
+            return True  # Exit after bot is deactivated
+        
+        if headless:
+            log.error("❌ No valid account session found; add one from the interactive menu first")
+            return False
         
         while True:
             try:
                 self.display_menu()
-                choice = input("\nEnter your choice (1-5): ").strip()
+                choice = (await ainput("\nEnter your choice (1-5): ")).strip()
                 
                 if choice == '1':
                     success = await self.add_account()
@@ -800,34 +783,43 @@ class TelegramUserBot:
                 
                 elif choice == '5':
                     print("👋 Goodbye!")
-                    # Disconnect all clients
-                    for account_name, account_info in self.accounts.items():
-                        try:
-                            await account_info['client'].disconnect()
-                        except:
-                            pass
-                    sys.exit(0)
+                    return True
                 
                 else:
                     print("❌ Invalid choice! Please select 1-5.")
-                
-            except KeyboardInterrupt:
+            
+            except (KeyboardInterrupt, EOFError):
                 print("\n👋 Goodbye!")
-                # Disconnect all clients
-                for account_name, account_info in self.accounts.items():
-                    try:
-                        await account_info['client'].disconnect()
-                    except:
-                        pass
-                sys.exit(0)
+                return True
             except Exception as e:
                 print(f"❌ Unexpected error: {str(e)}")
 
-async def main():
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Telegram UserBot")
+    parser.add_argument('--account', help="account to activate (default: first with a valid session)")
+    parser.add_argument('--headless', action='store_true',
+                        help="never show the menu; activate right away or exit with status 1")
+    return parser.parse_args()
+
+async def main(args):
     """Main function"""
     bot = TelegramUserBot()
-    await bot.run()
+    try:
+        ok = await bot.run(args.account, args.headless)
+    finally:
+        await bot.shutdown()
+        bot.state.close()
+        bot.journal.close()
+        tracer.close()
+        log.close()
+    if not ok:
+        sys.exit(1)
 
 if __name__ == "__main__":
+    args = parse_args()
     print("🚀 Starting Telegram UserBot...")
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        print("\n👋 Goodbye!")
@@ -0,0 +1,216 @@
+"""In-process counters and histograms with a Prometheus text endpoint"""
+import asyncio
+import bisect
+import time
+from logger import log
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    """Monotonic count, optionally split by label values"""
+    kind = 'counter'
+    
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}  # label values tuple -> count
+    
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[label]) for label in self.labels)
+        self.values[key] = self.values.get(key, 0) + amount
+    
+    def get(self, **labels):
+        return self.values.get(tuple(str(labels[label]) for label in self.labels), 0)
+    
+    def samples(self):
+        for key, value in self.values.items():
+            yield self.name, _format_labels(self.labels, key), value
+
+
+class Histogram:
+    """Distribution of observed values in fixed buckets, plus count and sum"""
+    kind = 'histogram'
+    
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.values = {}  # label values tuple -> [bucket counts..., count, sum]
+    
+    def observe(self, value, **labels):
+        key = tuple(str(labels[label]) for label in self.labels)
+        entry = self.values.get(key)
+        if entry is None:
+            entry = self.values[key] = [0] * (len(self.buckets) + 2)
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            entry[index] += 1
+        entry[-2] += 1
+        entry[-1] += value
+    
+    def quantile(self, q, **labels):
+        """Upper bucket bound below which a fraction q of observations fall"""
+        entry = self.values.get(tuple(str(labels[label]) for label in self.labels))
+        if not entry or not entry[-2]:
+            return None
+        rank = q * entry[-2]
+        seen = 0
+        for bound, count in zip(self.buckets, entry):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+    
+    def samples(self):
+        for key, entry in self.values.items():
+            seen = 0
+            for bound, count in zip(self.buckets, entry):
+                seen += count
+                yield f"{self.name}_bucket", _format_labels(self.labels, key, [('le', bound)]), seen
+            yield f"{self.name}_bucket", _format_labels(self.labels, key, [('le', '+Inf')]), entry[-2]
+            yield f"{self.name}_count", _format_labels(self.labels, key), entry[-2]
+            yield f"{self.name}_sum", _format_labels(self.labels, key), entry[-1]
+
+
+class CacheStats:
+    """Hit/miss counts read from the caches' own counters at scrape time"""
+    kind = 'counter'
+    
+    def __init__(self, name, help, sources):
+        self.name = name
+        self.help = help
+        self.sources = sources  # cache name -> object with hits and misses
+    
+    def samples(self):
+        for cache, source in self.sources.items():
+            yield self.name, _format_labels(('cache', 'result'), (cache, 'hit')), source.hits
+            yield self.name, _format_labels(('cache', 'result'), (cache, 'miss')), source.misses
+
+
+class Metrics:
+    """All userbot metrics, rendered in Prometheus text format or as a .stats summary"""
+    def __init__(self):
+        self.started_at = time.time()
+        self.command_seconds = Histogram(
+            'userbot_command_duration_seconds', "Time spent in a command handler", ('command',))
+        self.job_seconds = Histogram(
+            'userbot_job_duration_seconds', "Run time of background jobs", ('job', 'state'))
+        self.rpc_calls = Counter(
+            'userbot_rpc_calls_total', "Requests sent through the scheduler", ('method', 'outcome'))
+        self.rpc_seconds = Histogram(
+            'userbot_rpc_duration_seconds', "Request latency, excluding scheduler waits", ('method',))
+        self.flood_wait_seconds = Counter(
+            'userbot_flood_wait_seconds_total', "Seconds Telegram asked us to wait", ('method',))
+        self.messages_scanned = Counter(
+            'userbot_messages_scanned_total', "History messages scanned by #NexoUnion")
+        self.messages_deleted = Counter(
+            'userbot_messages_deleted_total', "Service messages deleted", ('source',))
+        self.cache_lookups = CacheStats('userbot_cache_lookups_total', "Cache lookups by result", {})
+        self.metrics = [self.command_seconds, self.job_seconds, self.rpc_calls, self.rpc_seconds,
+                        self.flood_wait_seconds, self.messages_scanned, self.messages_deleted,
+                        self.cache_lookups]
+    
+    def add_cache(self, name, cache):
+        """Report hit rates of a cache with hits and misses attributes"""
+        self.cache_lookups.sources[name] = cache
+    
+    def render(self):
+        """Return all metrics in Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+    
+    def summary(self):
+        """Return a short human-readable summary for .stats"""
+        lines = [f"**Uptime:** {time.time() - self.started_at:.0f}s"]
+        
+        commands = []
+        for (command,), entry in sorted(self.command_seconds.values.items()):
+            p95 = self.command_seconds.quantile(0.95, command=command)
+            commands.append(f"{command} ×{entry[-2]} avg {entry[-1] / entry[-2]:.2f}s p95 ≤{p95}s")
+        for (job, state), entry in sorted(self.job_seconds.values.items()):
+            commands.append(f"job {job} {state} ×{entry[-2]} avg {entry[-1] / entry[-2]:.1f}s")
+        lines.append("**Commands:** " + ("; ".join(commands) or "none"))
+        
+        rpcs = {}
+        for (method, outcome), count in self.rpc_calls.values.items():
+            rpcs.setdefault(method, {})[outcome] = count
+        rpc_lines = []
+        for method, outcomes in sorted(rpcs.items(), key=lambda item: -sum(item[1].values())):
+            line = f"{method} {sum(outcomes.values())}"
+            if len(outcomes) > 1 or 'ok' not in outcomes:
+                line += " (" + ", ".join(f"{outcome} {count}" for outcome, count in sorted(outcomes.items())) + ")"
+            flood = self.flood_wait_seconds.get(method=method)
+            if flood:
+                line += f", FloodWait {flood}s"
+            rpc_lines.append(line)
+        lines.append("**RPCs:** " + ("; ".join(rpc_lines) or "none"))
+        
+        cleanup = self.job_seconds.values.get(('cleanup', 'done'))
+        cleanup_seconds = cleanup[-1] if cleanup else 0
+        scanned = self.messages_scanned.get()
+        deleted = self.messages_deleted.get(source='cleanup')
+        line = f"**Cleanup:** {scanned} scanned, {deleted} deleted"
+        if cleanup_seconds:
+            line += f" ({scanned / cleanup_seconds:.0f} scanned/s, {deleted / cleanup_seconds:.0f} deleted/s)"
+        lines.append(line + f" | swept {self.messages_deleted.get(source='sweep')}")
+        
+        caches = []
+        for cache, source in self.cache_lookups.sources.items():
+            total = source.hits + source.misses
+            caches.append(f"{cache} {source.hits * 100 // total if total else 0}% of {total}")
+        lines.append("**Cache hits:** " + ("; ".join(caches) or "none"))
+        return "\n".join(lines)
+
+
+class MetricsServer:
+    """Minimal HTTP server answering GET /metrics on a local port"""
+    def __init__(self, metrics, port, host='127.0.0.1'):
+        self.metrics = metrics
+        self.port = port
+        self.host = host
+        self.server = None
+    
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        log.info(f"📈 Metrics available at http://{self.host}:{self.port}/metrics")
+    
+    async def handle(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            # Drain the headers; the request line is all we need
+            while (await asyncio.wait_for(reader.readline(), 5)) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status, body = '200 OK', self.metrics.render().encode()
+            else:
+                status, body = '404 Not Found', b'Not Found\n'
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
@@ -0,0 +1,119 @@
+"""Persistent cache of resolved usernames and invite hashes"""
+import json
+import os
+import sqlite3
+import time
+from telethon import utils
+from telethon.tl.types import InputPeerChannel, InputPeerChat, InputPeerUser
+
+NAMESPACE = 'peers'
+
+
+def entry_key(account, kind, key):
+    return json.dumps([account, kind, key.lower()])
+
+
+class PeerCache:
+    """Username/invite hash -> input peer cache with TTL and LRU eviction, kept in the state store
+
+    Access hashes are only valid for the account that saw them, so every
+    entry is keyed by account name as well. Each entry is a
+    [peer_type, peer_id, access_hash, resolved_at, used_at] list; lookups
+    are dict reads and the refreshed used_at of a hit is written out with
+    the store's next batched flush, off the event loop.
+    """
+    def __init__(self, state, ttl=7 * 24 * 3600, max_entries=5000):
+        self.state = state
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, account, kind, key):
+        """Return the cached input peer, or None on a miss or expired entry"""
+        name = entry_key(account, kind, key)
+        entry = self.state.get(NAMESPACE, name)
+        now = time.time()
+        if entry is None or entry[3] + self.ttl < now:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.state.set(NAMESPACE, name, entry[:4] + [now])
+        peer_type, peer_id, access_hash = entry[:3]
+        if peer_type == 'channel':
+            return InputPeerChannel(peer_id, access_hash)
+        if peer_type == 'user':
+            return InputPeerUser(peer_id, access_hash)
+        return InputPeerChat(peer_id)
+    
+    def put(self, account, kind, key, entity):
+        """Remember the peer an entity resolves to"""
+        try:
+            peer = utils.get_input_peer(entity)
+        except TypeError:
+            return
+        if isinstance(peer, InputPeerChannel):
+            row = ['channel', peer.channel_id, peer.access_hash]
+        elif isinstance(peer, InputPeerUser):
+            row = ['user', peer.user_id, peer.access_hash]
+        elif isinstance(peer, InputPeerChat):
+            row = ['chat', peer.chat_id, None]
+        else:
+            return
+        now = time.time()
+        self.state.set(NAMESPACE, entry_key(account, kind, key), row + [now, now])
+        self.evict()
+    
+    def forget(self, account, kind, key):
+        """Drop an entry, e.g. when the cached peer turned out to be stale"""
+        self.state.delete(NAMESPACE, entry_key(account, kind, key))
+    
+    def invite_ids(self, account):
+        """Return {invite hash: chat ID} for every invite hash seen by an account"""
+        invites = {}
+        for name, entry in self.state.items(NAMESPACE).items():
+            entry_account, kind, key = json.loads(name)
+            if entry_account == account and kind == 'invite':
+                invites[key] = entry[1]
+        return invites
+    
+    def evict(self):
+        """Remove expired entries and the least recently used ones above max_entries"""
+        entries = self.state.items(NAMESPACE)
+        expired = time.time() - self.ttl
+        stale = [name for name, entry in entries.items() if entry[3] < expired]
+        if len(entries) - len(stale) > self.max_entries:
+            live = sorted((name for name, entry in entries.items() if entry[3] >= expired),
+                          key=lambda name: entries[name][4])
+            stale += live[:len(live) - self.max_entries]
+        for name in stale:
+            self.state.delete(NAMESPACE, name)
+    
+    def stats(self):
+        """Return a short hit/miss summary"""
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0
+        return f"{self.hits} hits / {self.misses} misses ({rate:.0f}% saved round-trips)"
+
+
+def import_legacy_db(state, path='peer_cache.db'):
+    """Move the entries of the old peer_cache.db into the state store, once
+
+    The file is renamed to <path>.migrated so it is not imported again.
+    """
+    if not os.path.exists(path):
+        return False
+    db = sqlite3.connect(path)
+    try:
+        rows = db.execute('SELECT account, kind, key, peer_type, peer_id, access_hash, resolved_at, used_at '
+                          'FROM peers').fetchall()
+    except sqlite3.Error:
+        rows = []
+    finally:
+        db.close()
+    for account, kind, key, *entry in rows:
+        if state.get(NAMESPACE, entry_key(account, kind, key)) is None:
+            state.set(NAMESPACE, entry_key(account, kind, key), entry)
+    state.flush()
+    os.replace(path, f"{path}.migrated")
+    return True
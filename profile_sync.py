@@ -0,0 +1,98 @@
+"""Bring the account profile to the desired state, skipping what already matches"""
+import hashlib
+import os
+from telethon.tl.functions.account import UpdateProfileRequest, UpdateUsernameRequest
+from telethon.tl.functions.photos import DeletePhotosRequest, UploadProfilePhotoRequest
+from logger import log
+
+DESIRED_PROFILE = {'first_name': "UserBot @NexoUnion", 'last_name': "", 'about': ""}
+PROFILE_PICTURE = "pictures/ub1.png"
+
+
+def file_hash(path):
+    """Return the SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ProfileSync:
+    """Desired-state sync of name, bio, username and profile picture
+
+    Name and username are compared with the identity cache. The bio and
+    the uploaded picture (its content hash and resulting photo ID) are
+    recorded per account in the state store's 'profile' namespace, since
+    reading them back would cost as much as setting them.
+    """
+    def __init__(self, client, state, identity=None, picture_path=PROFILE_PICTURE):
+        self.client = client
+        self.state = state
+        self.identity = identity
+        self.picture_path = picture_path
+        self.key = identity.account_name if identity else None
+        self.record = dict(state.get('profile', self.key, {})) if self.key else {}
+    
+    def save(self):
+        if self.key:
+            self.state.set('profile', self.key, self.record)
+    
+    async def sync(self):
+        """Apply every step whose state differs; return the number of steps applied"""
+        applied = 0
+        for step in (self.sync_name, self.sync_username, self.sync_picture):
+            try:
+                if await step():
+                    applied += 1
+            except Exception as e:
+                log.warning(f"⚠️ Profile sync step {step.__name__} failed: {str(e)}", step=step.__name__, error=str(e))
+        return applied
+    
+    async def sync_name(self):
+        current = self.identity.data if self.identity else {}
+        if (current.get('first_name') == DESIRED_PROFILE['first_name']
+                and (current.get('last_name') or "") == DESIRED_PROFILE['last_name']
+                and self.record.get('about') == DESIRED_PROFILE['about']):
+            return False
+        await self.client(UpdateProfileRequest(**DESIRED_PROFILE))
+        log.info("✅ Profile name updated")
+        if self.identity:
+            self.identity.update(first_name=DESIRED_PROFILE['first_name'], last_name=DESIRED_PROFILE['last_name'])
+        self.record['about'] = DESIRED_PROFILE['about']
+        self.save()
+        return True
+    
+    async def sync_username(self):
+        if self.identity and self.identity.data and not self.identity.data.get('username'):
+            return False
+        await self.client(UpdateUsernameRequest(username=""))
+        log.info("✅ Username removed")
+        if self.identity:
+            self.identity.update(username=None)
+        return True
+    
+    async def sync_picture(self):
+        if not os.path.exists(self.picture_path):
+            log.warning(f"⚠️ Profile picture not found at {self.picture_path}", path=self.picture_path)
+            # Create pictures directory if it doesn't exist
+            os.makedirs(os.path.dirname(self.picture_path), exist_ok=True)
+            log.info("📁 Created pictures directory - please add ub1.png file")
+            return False
+        
+        picture_hash = file_hash(self.picture_path)
+        photos = await self.client.get_profile_photos('me')
+        if (picture_hash == self.record.get('photo_hash') and len(photos) == 1
+                and photos[0].id == self.record.get('photo_id')):
+            return False
+        
+        if photos:
+            await self.client(DeletePhotosRequest(id=photos))
+            log.info(f"✅ Removed {len(photos)} profile photos")
+        with open(self.picture_path, 'rb') as f:
+            result = await self.client(UploadProfilePhotoRequest(file=await self.client.upload_file(f)))
+        log.info("✅ New profile picture set")
+        self.record['photo_hash'] = picture_hash
+        self.record['photo_id'] = result.photo.id
+        self.save()
+        return True
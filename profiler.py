@@ -0,0 +1,99 @@
+"""Sampling profiler for the event loop thread, for the .profile command"""
+import asyncio
+import collections
+import os
+import sys
+import threading
+import time
+
+IDLE_FUNCTIONS = {('selectors.py', 'select'), ('selectors.py', '_select')}  # Loop waiting for I/O
+
+
+def frame_key(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """Sample the stack of one thread at a fixed interval from a helper thread
+
+    Only the sampling thread does work; the profiled thread runs
+    unchanged apart from briefly sharing the GIL. Stacks are counted per
+    function (self = leaf frame, total = anywhere on the stack), and as
+    collapsed stacks that flamegraph tools can read.
+    """
+    def __init__(self, thread_id=None, interval=0.005, max_depth=64):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self.idle = 0
+        self.self_counts = collections.Counter()
+        self.total_counts = collections.Counter()
+        self.stacks = collections.Counter()
+        self.seconds = 0.0
+    
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            stack.append(frame_key(frame))
+            frame = frame.f_back
+        self.samples += 1
+        leaf = stack[0]
+        if tuple(leaf.split(':', 1)) in IDLE_FUNCTIONS:
+            self.idle += 1
+            return
+        self.self_counts[leaf] += 1
+        self.total_counts.update(set(stack))
+        self.stacks[';'.join(reversed(stack))] += 1
+    
+    def _sample_for(self, seconds, stop):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline and not stop.is_set():
+            self.sample()
+            stop.wait(self.interval)
+    
+    async def run(self, seconds):
+        """Profile the calling (event loop) thread for the given number of seconds"""
+        stop = threading.Event()
+        start = time.perf_counter()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._sample_for, seconds, stop)
+        finally:
+            stop.set()
+            self.seconds = time.perf_counter() - start
+        return self
+    
+    def top(self, counts, limit):
+        busy = self.samples - self.idle
+        return [(key, count, count * 100 / busy if busy else 0) for key, count in counts.most_common(limit)]
+    
+    def summary(self, limit=5):
+        """Short result for the chat reply"""
+        busy = self.samples - self.idle
+        lines = [f"{self.samples} samples over {self.seconds:.0f}s, "
+                 f"loop busy {busy * 100 / self.samples if self.samples else 0:.0f}%"]
+        for key, count, percent in self.top(self.self_counts, limit):
+            lines.append(f"{percent:5.1f}% {key}")
+        return "\n".join(lines)
+    
+    def write(self, directory='profiles'):
+        """Write a text report and a collapsed-stack file; return the report path"""
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(directory, f"profile-{stamp}.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"Sampled every {self.interval * 1000:.0f} ms for {self.seconds:.1f}s: "
+                    f"{self.samples} samples, {self.idle} idle (waiting for I/O)\n")
+            for title, counts in (("Self time (leaf frame)", self.self_counts),
+                                  ("Total time (anywhere on the stack)", self.total_counts)):
+                f.write(f"\n{title}, % of busy samples:\n")
+                for key, count, percent in self.top(counts, 30):
+                    f.write(f"{percent:6.1f}% {count:7d}  {key}\n")
+        with open(os.path.join(directory, f"profile-{stamp}.collapsed"), 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
@@ -0,0 +1,102 @@
+"""One self-updating status message for long-running commands"""
+import asyncio
+import time
+
+
+def format_duration(seconds):
+    """Format seconds as e.g. 45s, 3m05s or 1h02m"""
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+
+class ProgressReporter:
+    """Edit a single status reply with counts, rate and ETA, at most once per interval
+
+    update() is cheap and can be called for every page or item; it only
+    starts an edit when interval seconds have passed since the last one
+    and no edit is still in flight. finish() puts the final result in the
+    same message and deletes it after linger seconds.
+    """
+    def __init__(self, event, title, total=None, unit='items', labels=None, interval=3.0, linger=2.0, rpc=None):
+        self.event = event
+        self.title = title
+        self.total = total
+        self.unit = unit
+        self.labels = labels or {}  # count name -> label shown in the message
+        self.interval = interval
+        self.linger = linger
+        self.rpc = rpc
+        self.message = None
+        self.done = 0
+        self.counts = {name: 0 for name in self.labels}
+        self.started_at = time.monotonic()
+        self.last_edit = self.started_at
+        self.edit_task = None
+    
+    async def start(self):
+        """Send the status reply"""
+        self.started_at = self.last_edit = time.monotonic()
+        self.message = await self.call('send', self.event.reply, self.render())
+        return self
+    
+    async def call(self, method, func, *args):
+        if self.rpc is None:
+            return await func(*args)
+        return await self.rpc.call(method, func, *args)
+    
+    def render(self):
+        lines = [self.title]
+        if self.counts:
+            lines.append(" | ".join(f"{self.labels[name]}: {value}" for name, value in self.counts.items()))
+        elapsed = time.monotonic() - self.started_at
+        rate = self.done / elapsed if elapsed > 0 else 0
+        if self.total:
+            line = f"{self.done}/{self.total} {self.unit} ({self.done * 100 // self.total}%) · {rate:.1f}/s"
+            if rate > 0 and self.done < self.total:
+                line += f" · ETA {format_duration((self.total - self.done) / rate)}"
+        else:
+            line = f"{self.done} {self.unit} · {rate:.1f}/s"
+        lines.append(line + f" · {format_duration(elapsed)} elapsed")
+        return "\n".join(lines)
+    
+    def update(self, done=None, **counts):
+        """Record progress and edit the status message if an edit is due"""
+        if done is not None:
+            self.done = done
+        self.counts.update(counts)
+        now = time.monotonic()
+        if self.message is None or self.edit_task is not None or now - self.last_edit < self.interval:
+            return
+        self.last_edit = now
+        self.edit_task = asyncio.create_task(self._edit(self.render()))
+    
+    async def _edit(self, text):
+        try:
+            await self.call('edit', self.message.edit, text)
+        except Exception:
+            pass  # A skipped progress edit is harmless
+        finally:
+            self.edit_task = None
+    
+    async def finish(self, text, keep=False):
+        """Show the final result, then delete the message after linger seconds unless keep is set"""
+        if self.edit_task is not None:
+            self.edit_task.cancel()
+        if self.message is None:
+            self.message = await self.call('send', self.event.reply, text)
+        else:
+            try:
+                await self.call('edit', self.message.edit, text)
+            except Exception:
+                pass
+        if keep:
+            return
+        await asyncio.sleep(self.linger)
+        try:
+            await self.call('delete', self.message.delete)
+        except Exception:
+            pass
@@ -0,0 +1,162 @@
+"""Central pacing of Telegram requests with adaptive per-method rate limits"""
+import asyncio
+import contextvars
+import time
+from telethon import TelegramClient
+from telethon.errors import FloodWaitError
+from logger import log
+from tracing import tracer
+
+
+class MethodLimit:
+    """Rate settings for one kind of request: start, floor and ceiling in calls per second"""
+    def __init__(self, rate, max_rate, min_rate=0.05, burst=1):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = burst
+
+
+# Starting rates match the fixed sleeps the handlers used to have; each
+# method then speeds up towards max_rate until Telegram pushes back
+DEFAULT_LIMITS = {
+    'delete': MethodLimit(rate=3.0, max_rate=10.0, burst=5),
+    'join': MethodLimit(rate=0.5, max_rate=1.0),
+    'leave': MethodLimit(rate=0.5, max_rate=2.0),
+    'kick': MethodLimit(rate=1.0, max_rate=3.0),
+    'resolve': MethodLimit(rate=2.0, max_rate=5.0, burst=3),
+    'history': MethodLimit(rate=10.0, max_rate=30.0, burst=4),
+}
+FALLBACK_LIMIT = MethodLimit(rate=5.0, max_rate=20.0, burst=2)
+
+_scheduled = contextvars.ContextVar('rpc_scheduled', default=False)
+
+
+class ScheduledClient(TelegramClient):
+    """TelegramClient that leaves the FloodWaits of scheduled requests to the RpcScheduler
+
+    Requests made inside RpcScheduler.call see a flood_sleep_threshold of
+    0, so a FloodWait reaches the scheduler at once to be paced and
+    retried. Every other request (login, replies, profile sync) keeps
+    Telethon's threshold and sleeps through short FloodWaits as usual.
+    """
+    @property
+    def flood_sleep_threshold(self):
+        return 0 if _scheduled.get() else self._flood_sleep_threshold
+    
+    @flood_sleep_threshold.setter
+    def flood_sleep_threshold(self, value):
+        TelegramClient.flood_sleep_threshold.fset(self, value)
+
+
+class TokenBucket:
+    """Token bucket whose refill rate adapts: halved on FloodWait, raised slowly on success"""
+    def __init__(self, limit, increase=0.05, decrease=0.5):
+        self.rate = limit.rate
+        self.max_rate = limit.max_rate
+        self.min_rate = limit.min_rate
+        self.burst = limit.burst
+        self.increase = increase  # Fraction of max_rate added after each successful call
+        self.decrease = decrease  # Factor applied to the rate after a FloodWait
+        self.tokens = float(limit.burst)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0  # Set from FloodWaitError.seconds
+        self.lock = asyncio.Lock()
+    
+    async def acquire(self, max_wait=None):
+        """Wait until a call is allowed, then take a token
+
+        If a FloodWait blocks the method for more than max_wait seconds,
+        raise FloodWaitError straight away instead of sleeping through it.
+        """
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    if max_wait is not None and self.blocked_until - now > max_wait:
+                        raise FloodWaitError(None, capture=int(self.blocked_until - now + 0.999))
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+    
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate * self.increase)
+    
+    def on_flood_wait(self, seconds):
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+
+class RpcScheduler:
+    """Run every handler request through a per-method token bucket
+
+    A FloodWaitError blocks that method for exactly the number of seconds
+    the server asked for, halves its rate and retries the call. Calls
+    that keep succeeding raise the rate step by step up to max_rate.
+    Waits longer than max_flood_wait are not slept through; the error is
+    raised to the caller instead, and so is every call of that method
+    until the wait is over.
+    """
+    def __init__(self, limits=None, max_retries=3, max_flood_wait=900, metrics=None):
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.metrics = metrics
+        self.max_retries = max_retries
+        self.max_flood_wait = max_flood_wait
+        self.buckets = {}  # method -> TokenBucket
+        self.flood_waits = 0
+        self.flood_wait_seconds = 0
+    
+    def bucket(self, method):
+        bucket = self.buckets.get(method)
+        if bucket is None:
+            bucket = self.buckets[method] = TokenBucket(self.limits.get(method, FALLBACK_LIMIT))
+        return bucket
+    
+    async def call(self, method, func, *args, **kwargs):
+        """Await func(*args, **kwargs) once the method's rate allows it"""
+        bucket = self.bucket(method)
+        for attempt in range(self.max_retries + 1):
+            with tracer.span('rpc.wait', method):
+                await bucket.acquire(self.max_flood_wait)
+            start = time.perf_counter()
+            try:
+                token = _scheduled.set(True)
+                try:
+                    with tracer.span('rpc', method, attempt=attempt):
+                        result = await func(*args, **kwargs)
+                finally:
+                    _scheduled.reset(token)
+            except FloodWaitError as e:
+                self.record(method, 'flood_wait', start)
+                self.flood_waits += 1
+                self.flood_wait_seconds += e.seconds
+                if self.metrics:
+                    self.metrics.flood_wait_seconds.inc(e.seconds, method=method)
+                bucket.on_flood_wait(e.seconds)
+                if attempt == self.max_retries or e.seconds > self.max_flood_wait:
+                    raise
+                log.warning(f"⏳ FloodWait on {method}: waiting {e.seconds}s (rate now {bucket.rate:.2f}/s)",
+                            method=method, seconds=e.seconds, rate=round(bucket.rate, 3))
+                continue
+            except Exception:
+                self.record(method, 'error', start)
+                raise
+            self.record(method, 'ok', start)
+            bucket.on_success()
+            return result
+    
+    def record(self, method, outcome, start):
+        if self.metrics:
+            self.metrics.rpc_calls.inc(method=method, outcome=outcome)
+            self.metrics.rpc_seconds.observe(time.perf_counter() - start, method=method)
+    
+    def stats(self):
+        """Return a short summary of the current rates"""
+        rates = ", ".join(f"{method} {bucket.rate:.2f}/s" for method, bucket in self.buckets.items())
+        return f"{rates or 'idle'} | {self.flood_waits} FloodWaits ({self.flood_wait_seconds}s)"
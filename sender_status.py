@@ -0,0 +1,57 @@
+"""Cache of which message senders are deleted accounts"""
+import time
+from telethon.tl.functions.users import GetUsersRequest
+from telethon.tl.types import User, PeerUser
+
+USERS_PER_REQUEST = 200  # Maximum IDs accepted by a single GetUsersRequest
+
+
+class SenderStatusCache:
+    """Remember per user ID whether the account is deleted, with a TTL"""
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self.entries = {}  # user_id -> (deleted, expires_at)
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, user_id):
+        """Return True/False for a cached user, or None if unknown or expired"""
+        entry = self.entries.get(user_id)
+        if entry is None or entry[1] < time.monotonic():
+            return None
+        return entry[0]
+    
+    def remember(self, users):
+        """Cache the deleted flag of User objects we already have, e.g. from a history page"""
+        expires_at = time.monotonic() + self.ttl
+        for user in users:
+            if isinstance(user, User):
+                self.entries[user.id] = (bool(user.deleted), expires_at)
+    
+    async def resolve(self, client, user_ids, rpc=None, users=()):
+        """Look up every unknown user ID with one batched GetUsersRequest per 200 IDs
+
+        users are User objects that came with the same response, e.g. a
+        history page. They are cached first, so their IDs need no lookup,
+        but hits and misses are counted before that, so they only show
+        what the cache already knew.
+        """
+        known = sum(1 for user_id in user_ids if self.get(user_id) is not None)
+        self.hits += known
+        self.misses += len(user_ids) - known
+        self.remember(users)
+        missing = [user_id for user_id in user_ids if self.get(user_id) is None]
+        input_users = []
+        for user_id in missing:
+            try:
+                input_users.append(await client.get_input_entity(PeerUser(user_id)))
+            except ValueError:
+                # Not in the session cache, so it can't be looked up by ID
+                pass
+        for i in range(0, len(input_users), USERS_PER_REQUEST):
+            request = GetUsersRequest(input_users[i:i + USERS_PER_REQUEST])
+            self.remember(await (rpc.call('users', client, request) if rpc else client(request)))
+    
+    def deleted_among(self, user_ids):
+        """Return the subset of user IDs known to be deleted accounts"""
+        return {user_id for user_id in user_ids if self.get(user_id)}
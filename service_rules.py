@@ -0,0 +1,97 @@
+"""Keep/delete rules for #NexoUnion service message cleanup"""
+from telethon.tl.types import (
+    MessageActionChatAddUser, MessageActionChatDeleteUser, MessageActionChatJoinedByLink,
+    MessageActionChatJoinedByRequest, MessageActionChatMigrateTo, MessageActionChannelMigrateFrom,
+    MessageActionChatCreate, MessageActionChannelCreate, MessageActionChatEditTitle,
+    MessageActionChatEditPhoto, MessageActionChatDeletePhoto, MessageActionPinMessage,
+    Message, MessageService, PeerUser,
+)
+
+# Verdicts returned by ServiceRuleTable.classify
+KEEP = 0
+DELETE_SERVICE = 1
+DELETE_DELETED_ACCOUNT = 2
+
+# Action names usable in bot_config.json -> Telethon action classes
+ACTION_TYPES = {
+    'chat_add_user': MessageActionChatAddUser,
+    'chat_delete_user': MessageActionChatDeleteUser,
+    'chat_joined_by_link': MessageActionChatJoinedByLink,
+    'chat_joined_by_request': MessageActionChatJoinedByRequest,
+    'chat_migrate_to': MessageActionChatMigrateTo,
+    'channel_migrate_from': MessageActionChannelMigrateFrom,
+    'chat_create': MessageActionChatCreate,
+    'channel_create': MessageActionChannelCreate,
+    'chat_edit_title': MessageActionChatEditTitle,
+    'chat_edit_photo': MessageActionChatEditPhoto,
+    'chat_delete_photo': MessageActionChatDeletePhoto,
+    'pin_message': MessageActionPinMessage,
+}
+
+# Delete every service message except the group creation one
+DEFAULT_RULES = {
+    'default': 'delete',  # Verdict for action types not listed below
+    'keep': ['chat_create', 'channel_create'],
+    'delete': [],
+    'deleted_accounts': True,  # Also delete text messages from deleted accounts
+}
+
+
+class ServiceRuleTable:
+    """Rules compiled into a lookup table keyed by action class"""
+    def __init__(self, rules=None):
+        rules = {**DEFAULT_RULES, **(rules or {})}
+        self.default = DELETE_SERVICE if rules['default'] == 'delete' else KEEP
+        self.delete_deleted_accounts = bool(rules['deleted_accounts'])
+        self.table = {}
+        for verdict, names in ((KEEP, rules['keep']), (DELETE_SERVICE, rules['delete'])):
+            for name in names:
+                if name not in ACTION_TYPES:
+                    raise ValueError(f"Unknown service message action: {name}")
+                self.table[ACTION_TYPES[name]] = verdict
+    
+    def classify(self, message, deleted_senders=()):
+        """Return KEEP, DELETE_SERVICE or DELETE_DELETED_ACCOUNT for a message
+
+        deleted_senders is a set of user IDs known to be deleted accounts.
+        Messages without a user sender (channel posts, anonymous admins)
+        are never treated as coming from a deleted account.
+        """
+        action = message.action
+        if action is not None:
+            return self.table.get(action.__class__, self.default)
+        if self.delete_deleted_accounts:
+            from_id = message.from_id
+            if from_id.__class__ is PeerUser and from_id.user_id in deleted_senders:
+                return DELETE_DELETED_ACCOUNT
+        return KEEP
+    
+    def classify_raw(self, message, deleted_senders=()):
+        """Same as classify, for raw Message/MessageService objects from GetHistoryRequest"""
+        cls = message.__class__
+        if cls is MessageService:
+            return self.table.get(message.action.__class__, self.default)
+        if cls is Message and self.delete_deleted_accounts:
+            from_id = message.from_id
+            if from_id.__class__ is PeerUser and from_id.user_id in deleted_senders:
+                return DELETE_DELETED_ACCOUNT
+        return KEEP
+
+
+class ServiceRuleEngine:
+    """Per-chat rule tables, compiled once and cached"""
+    def __init__(self, config=None):
+        config = config or {}
+        self.default_rules = {**DEFAULT_RULES, **config.get('default', {})}
+        self.chat_rules = {str(chat_id): rules for chat_id, rules in config.get('chats', {}).items()}
+        self.default_table = ServiceRuleTable(self.default_rules)
+        self.tables = {}
+    
+    def for_chat(self, chat_id):
+        """Return the compiled rule table for a chat"""
+        key = str(chat_id)
+        if key not in self.chat_rules:
+            return self.default_table
+        if key not in self.tables:
+            self.tables[key] = ServiceRuleTable({**self.default_rules, **self.chat_rules[key]})
+        return self.tables[key]
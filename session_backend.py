@@ -0,0 +1,203 @@
+"""Telethon session storage: per-account SQLite files, or in memory with snapshots"""
+import asyncio
+import base64
+import datetime
+import json
+import os
+import sqlite3
+import threading
+from telethon.crypto import AuthKey
+from telethon.sessions import MemorySession
+from telethon.tl.types.updates import State
+from state_store import load_json, write_json_atomic
+from logger import log
+
+BACKENDS = ('sqlite', 'memory', 'shared')
+
+
+class SnapshotSession(MemorySession):
+    """MemorySession that remembers whether it changed since the last snapshot
+
+    Telethon calls save() and process_entities() on the hot path; here they
+    only set a flag; the SessionBackend writes the state out on its own
+    schedule.
+    """
+    def __init__(self, data=None):
+        super().__init__()
+        self.dirty = False
+        if data:
+            self.restore(data)
+    
+    def set_dc(self, dc_id, server_address, port):
+        super().set_dc(dc_id, server_address, port)
+        self.dirty = True
+    
+    @MemorySession.auth_key.setter
+    def auth_key(self, value):
+        self._auth_key = value
+        self.dirty = True
+    
+    def set_update_state(self, entity_id, state):
+        super().set_update_state(entity_id, state)
+        self.dirty = True
+    
+    def process_entities(self, tlo):
+        before = len(self._entities)
+        super().process_entities(tlo)
+        if len(self._entities) != before:
+            self.dirty = True
+    
+    def save(self):
+        self.dirty = True
+    
+    def snapshot(self):
+        """Return the session state as JSON-serializable data"""
+        return {
+            'dc_id': self._dc_id,
+            'server_address': self._server_address,
+            'port': self._port,
+            'auth_key': base64.b64encode(self._auth_key.key).decode() if self._auth_key else None,
+            'takeout_id': self._takeout_id,
+            'entities': [list(row) for row in self._entities],
+            'update_states': {str(entity_id): [state.pts, state.qts, state.date.timestamp(), state.seq]
+                              for entity_id, state in self._update_states.items()},
+        }
+    
+    def restore(self, data):
+        """Load state produced by snapshot()"""
+        self._dc_id = data.get('dc_id') or 0
+        self._server_address = data.get('server_address')
+        self._port = data.get('port')
+        if data.get('auth_key'):
+            self._auth_key = AuthKey(data=base64.b64decode(data['auth_key']))
+        self._takeout_id = data.get('takeout_id')
+        self._entities = {tuple(row) for row in data.get('entities', [])}
+        for entity_id, (pts, qts, date, seq) in data.get('update_states', {}).items():
+            date = datetime.datetime.fromtimestamp(date, tz=datetime.timezone.utc)
+            self._update_states[int(entity_id)] = State(pts, qts, date, seq, unread_count=0)
+
+
+def read_sqlite_session(path):
+    """Read a Telethon .session file into snapshot() data, or return None"""
+    if not os.path.exists(path):
+        return None
+    db = sqlite3.connect(path)
+    try:
+        row = db.execute('SELECT dc_id, server_address, port, auth_key, takeout_id FROM sessions').fetchone()
+        if row is None:
+            return None
+        entities = db.execute('SELECT id, hash, username, phone, name FROM entities').fetchall()
+        states = db.execute('SELECT id, pts, qts, date, seq FROM update_state').fetchall()
+    except sqlite3.Error:
+        return None
+    finally:
+        db.close()
+    dc_id, server_address, port, auth_key, takeout_id = row
+    return {
+        'dc_id': dc_id,
+        'server_address': server_address,
+        'port': port,
+        'auth_key': base64.b64encode(auth_key).decode() if auth_key else None,
+        'takeout_id': takeout_id,
+        'entities': [list(entity) for entity in entities],
+        'update_states': {str(state[0]): list(state[1:]) for state in states},
+    }
+
+
+class SessionBackend:
+    """Hand out Telethon sessions for accounts according to config.json
+
+    'sqlite' (default) keeps Telethon's own sessions/<account>_session.session
+    file per account. 'memory' keeps sessions in memory and snapshots each
+    one atomically to sessions/<account>_session.json. 'shared' snapshots
+    every account into one sessions/sessions.db. In both memory modes only
+    changed sessions are written, every snapshot_interval seconds and at
+    shutdown, and an existing .session file is imported on first use.
+    """
+    def __init__(self, kind='sqlite', directory='sessions', snapshot_interval=60):
+        if kind not in BACKENDS:
+            raise ValueError(f"Unknown session backend: {kind} (expected one of {', '.join(BACKENDS)})")
+        self.kind = kind
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.sessions = {}  # account name -> SnapshotSession
+        self.task = None
+        self.lock = threading.Lock()
+        self.db = None
+        if kind == 'shared':
+            os.makedirs(directory, exist_ok=True)
+            self.db = sqlite3.connect(os.path.join(directory, 'sessions.db'), check_same_thread=False)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('CREATE TABLE IF NOT EXISTS sessions (account TEXT PRIMARY KEY, data TEXT NOT NULL)')
+            self.db.commit()
+    
+    def path(self, account_name):
+        return os.path.join(self.directory, f"{account_name}_session")
+    
+    def open(self, account_name):
+        """Return the session to pass to TelegramClient for an account"""
+        if self.kind == 'sqlite':
+            return self.path(account_name)
+        session = self.sessions.get(account_name)
+        if session is None:
+            data = self.load(account_name)
+            if data is None:
+                data = read_sqlite_session(f"{self.path(account_name)}.session")
+            session = self.sessions[account_name] = SnapshotSession(data)
+            session.dirty = data is not None
+        return session
+    
+    def load(self, account_name):
+        if self.kind == 'shared':
+            with self.lock:
+                row = self.db.execute('SELECT data FROM sessions WHERE account = ?', (account_name,)).fetchone()
+            return json.loads(row[0]) if row else None
+        return load_json(f"{self.path(account_name)}.json")
+    
+    def write(self, snapshots):
+        """Write {account name: snapshot data}; each write is atomic"""
+        if self.kind == 'shared':
+            with self.lock, self.db:
+                self.db.executemany('INSERT OR REPLACE INTO sessions VALUES (?, ?)',
+                                    [(account, json.dumps(data)) for account, data in snapshots.items()])
+            return
+        for account_name, data in snapshots.items():
+            write_json_atomic(f"{self.path(account_name)}.json", data)
+    
+    def collect(self):
+        """Take snapshots of the sessions that changed"""
+        snapshots = {}
+        for account_name, session in self.sessions.items():
+            if session.dirty and session.auth_key is not None:
+                session.dirty = False
+                snapshots[account_name] = session.snapshot()
+        return snapshots
+    
+    def start(self):
+        """Start periodic snapshots (no-op for the sqlite backend)"""
+        if self.kind != 'sqlite' and self.task is None:
+            self.task = asyncio.create_task(self._snapshot_loop())
+    
+    async def _snapshot_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            snapshots = self.collect()
+            if snapshots:
+                try:
+                    await loop.run_in_executor(None, self.write, snapshots)
+                except Exception as e:
+                    log.warning(f"⚠️ Session snapshot failed: {str(e)}", error=str(e))
+    
+    def close(self):
+        """Stop periodic snapshots and write every changed session"""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        snapshots = self.collect()
+        if snapshots:
+            self.write(snapshots)
+        if self.db is not None:
+            with self.lock:
+                self.db.close()
+            self.db = None
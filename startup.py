@@ -0,0 +1,45 @@
+"""Time the phases of startup, so slow imports or session checks show up in the log"""
+import time
+from contextlib import contextmanager
+from logger import log
+
+
+class StartupTimer:
+    """Accumulate wall time per startup phase and log it once the bot is ready
+
+    Phases are timed with phase() or recorded directly with record();
+    a phase entered twice (e.g. handlers registered again after the menu)
+    adds to its earlier time. report() logs the breakdown the first time
+    it is called and keeps it for .stats.
+    """
+    def __init__(self, started_at=None):
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.phases = {}  # phase name -> seconds, in the order first seen
+        self.reported = None
+    
+    def record(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+    
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+    
+    def summary(self):
+        """One line: total time since start, then each phase"""
+        if self.reported is not None:
+            return self.reported
+        total = time.perf_counter() - self.started_at
+        phases = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases.items())
+        return f"{total:.2f}s ({phases})"
+    
+    def report(self):
+        """Log the startup breakdown, once"""
+        if self.reported is not None:
+            return
+        self.reported = self.summary()
+        log.info(f"⏱️ Started in {self.reported}",
+                 **{f"{name}_ms": round(seconds * 1000, 1) for name, seconds in self.phases.items()})
@@ -0,0 +1,184 @@
+"""SQLite-backed store for all bot state (accounts, watermarks, identities)"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+
+# Schema changes are appended here; the list index + 1 is the schema version
+MIGRATIONS = [
+    ['''CREATE TABLE state (
+        namespace TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        PRIMARY KEY (namespace, key)
+    )'''],
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+_DELETED = object()
+
+
+def load_json(path):
+    """Load a JSON file, or return None if it is missing, empty or broken"""
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                content = f.read().strip()
+                if content:
+                    return json.loads(content)
+        except (json.JSONDecodeError, FileNotFoundError):
+            pass
+    return None
+
+
+def write_json_atomic(path, data):
+    """Write a JSON file via a temporary file and rename, so readers never see half of it"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class StateStore:
+    """Namespaced key -> JSON value store kept in memory and flushed to SQLite
+
+    Reads are dict lookups. Writes are serialized on the caller's thread,
+    collected, and flushed in one transaction from a worker thread
+    flush_delay seconds after the first unflushed change, so a burst of
+    updates costs a single commit and never blocks the event loop. Outside
+    a running event loop writes are flushed straight away.
+
+    Each flushed batch gets a generation number and stays queued until it
+    is committed. Whichever write takes the lock first commits every queued
+    batch up to its own, in order, so an older batch can never overwrite a
+    newer one and close() never leaves a worker writing after it.
+    """
+    def __init__(self, path='state.db', flush_delay=0.5):
+        self.path = path
+        self.flush_delay = flush_delay
+        self.lock = threading.Lock()  # Held while writing to the database
+        self.queue_lock = threading.Lock()  # Held briefly around self.queued, never while writing
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.migrate()
+        self.data = {}  # namespace -> {key: value}
+        for namespace, key, value in self.db.execute('SELECT namespace, key, value FROM state'):
+            self.data.setdefault(namespace, {})[key] = json.loads(value)
+        self.dirty = {}  # (namespace, key) -> JSON text, or _DELETED
+        self.flush_handle = None
+        self.tasks = set()  # Keep references to running flushes
+        self.generation = 0
+        self.queued = {}  # generation -> batch taken from dirty, not yet committed
+    
+    def migrate(self):
+        """Bring the database schema up to SCHEMA_VERSION"""
+        version = self.db.execute('PRAGMA user_version').fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f"{self.path} has schema version {version}, newer than supported {SCHEMA_VERSION}")
+        for statements in MIGRATIONS[version:]:
+            with self.db:
+                for statement in statements:
+                    self.db.execute(statement)
+        self.db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    
+    def get(self, namespace, key, default=None):
+        """Return the stored value, or default"""
+        return self.data.get(namespace, {}).get(key, default)
+    
+    def items(self, namespace):
+        """Return a {key: value} dict of one namespace"""
+        return self.data.get(namespace, {})
+    
+    def set(self, namespace, key, value):
+        """Store a JSON-serializable value and schedule a flush"""
+        self.data.setdefault(namespace, {})[key] = value
+        self.dirty[(namespace, key)] = json.dumps(value)
+        self.schedule_flush()
+    
+    def delete(self, namespace, key):
+        """Remove a key and schedule a flush"""
+        if self.data.get(namespace, {}).pop(key, None) is not None:
+            self.dirty[(namespace, key)] = _DELETED
+            self.schedule_flush()
+    
+    def import_json(self, namespace, path, transform=None):
+        """Move a legacy JSON file into a namespace, once
+
+        transform(data) returns the {key: value} entries to import; the
+        file's top-level dict is used as-is by default. The file is renamed
+        to <path>.migrated so it is not imported again.
+        """
+        data = load_json(path)
+        if data is None:
+            return False
+        entries = transform(data) if transform else data
+        for key, value in entries.items():
+            if self.get(namespace, key) is None:
+                self.set(namespace, key, value)
+        self.flush()
+        os.replace(path, f"{path}.migrated")
+        return True
+    
+    def schedule_flush(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.flush_delay, self._flush_in_background, loop)
+    
+    def _flush_in_background(self, loop):
+        # Take the pending changes on the loop thread so set() never races the writer
+        self.flush_handle = None
+        generation = self._take()
+        task = asyncio.ensure_future(loop.run_in_executor(None, self._write, generation))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+    
+    def flush(self):
+        """Write all pending changes now, in one transaction"""
+        self._write(self._take())
+    
+    def _take(self):
+        # Move the dirty changes into a numbered batch; called on the loop thread
+        with self.queue_lock:
+            self.generation += 1
+            self.queued[self.generation] = self.dirty
+            self.dirty = {}
+            return self.generation
+    
+    def _write(self, generation):
+        with self.lock:
+            self._commit(generation)
+    
+    def _commit(self, generation):
+        # Commit every queued batch up to generation, oldest first; the caller holds the lock
+        pending = {}
+        with self.queue_lock:
+            for queued in sorted(self.queued):
+                if queued > generation:
+                    break
+                pending.update(self.queued.pop(queued))
+        if not pending:
+            return
+        with self.db:
+            for (namespace, key), value in pending.items():
+                if value is _DELETED:
+                    self.db.execute('DELETE FROM state WHERE namespace = ? AND key = ?', (namespace, key))
+                else:
+                    self.db.execute('INSERT OR REPLACE INTO state VALUES (?, ?, ?)', (namespace, key, value))
+    
+    def close(self):
+        """Flush pending changes, including batches still waiting for a worker, and close the database"""
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        generation = self._take()
+        with self.lock:
+            self._commit(generation)
+            self.db.close()
@@ -0,0 +1,114 @@
+"""Tests for the ID range bookkeeping of LeanHistoryScanner"""
+import asyncio
+from types import SimpleNamespace
+
+from telethon.tl.types import Message, PeerChannel
+
+from history_scan import LeanHistoryScanner
+from sender_status import SenderStatusCache
+from service_rules import ServiceRuleTable
+
+
+class FakeHistoryClient:
+    """Answers GetHistoryRequest from a sorted list of existing message IDs"""
+    def __init__(self, message_ids):
+        self.message_ids = sorted(message_ids, reverse=True)
+        self.requests = 0
+
+    async def __call__(self, request):
+        self.requests += 1
+        upper = request.offset_id or float('inf')
+        ids = [message_id for message_id in self.message_ids if request.min_id < message_id < upper]
+        messages = [Message(id=message_id, peer_id=PeerChannel(1), date=None, message='hi')
+                    for message_id in ids[:request.limit]]
+        return SimpleNamespace(messages=messages, users=[], chats=[])
+
+
+def make_scanner(message_ids, page_size=10):
+    client = FakeHistoryClient(message_ids)
+    return LeanHistoryScanner(client, ServiceRuleTable(), SenderStatusCache(), page_size=page_size)
+
+
+def collect(pages, stop_after=None):
+    async def run():
+        ids = []
+        pages_seen = 0
+        async for page_ids, _ in pages:
+            ids.extend(page_ids)
+            pages_seen += 1
+            if pages_seen == stop_after:
+                break
+        return ids
+    return asyncio.run(run())
+
+
+def test_gaps_of_empty_scan_is_everything_above_floor():
+    scanner = make_scanner([])
+    assert scanner.gaps(5) == [(5, 0)]
+
+
+def test_gaps_between_and_below_covered_ranges():
+    scanner = make_scanner([])
+    scanner.covered = [(90, None), (40, 60)]
+    assert scanner.gaps(10) == [(10, 40), (59, 90)]
+
+
+def test_gaps_ignores_adjacent_and_overlapping_ranges():
+    scanner = make_scanner([])
+    scanner.covered = [(80, None), (50, 81), (20, 55)]
+    assert scanner.gaps(0) == [(0, 20)]
+    scanner.covered = [(80, None), (50, 81), (20, 55)]
+    assert scanner.gaps(19) == []
+
+
+def test_gaps_of_range_without_open_top():
+    scanner = make_scanner([])
+    scanner.covered = [(30, 50)]
+    assert scanner.gaps(0) == [(0, 30), (49, 0)]
+
+
+def test_covered_ranges_merges_touching_spans():
+    scanner = make_scanner([])
+    scanner.covered = [(50, 70), (70, None), (10, 30), (25, 40)]
+    assert scanner.covered_ranges() == [[10, 40], [50, None]]
+
+
+def test_covered_ranges_keeps_separate_spans():
+    scanner = make_scanner([])
+    scanner.covered = [(10, 20), (30, 40)]
+    assert scanner.covered_ranges() == [[10, 20], [30, 40]]
+
+
+def resume_after_interrupt(message_ids, windows, limit, stop_after):
+    """Scan, stop after some pages, resume from the checkpoint; return (first ids, resumed ids, full ids)"""
+    scanner = make_scanner(message_ids)
+    first = collect(scanner.scan(None, limit=limit, windows=windows), stop_after)
+    checkpoint = (scanner.covered_ranges(), scanner.floor, scanner.budget)
+    resumed_scanner = make_scanner(message_ids)
+    resumed = collect(resumed_scanner.resume(None, *checkpoint))
+    full = collect(make_scanner(message_ids).scan(None, limit=limit, windows=windows))
+    return first, resumed, full
+
+
+def test_resume_count_limited_scan_with_sparse_ids():
+    # Basic groups share IDs across the account, so a chat's IDs are far apart
+    message_ids = range(10, 10_000, 10)
+    first, resumed, full = resume_after_interrupt(message_ids, windows=1, limit=300, stop_after=7)
+    assert len(full) == 300
+    assert len(first) == 70
+    assert sorted(first + resumed) == sorted(full)
+
+
+def test_resume_windowed_scan():
+    message_ids = range(1, 2001)
+    first, resumed, full = resume_after_interrupt(message_ids, windows=4, limit=1000, stop_after=3)
+    assert len(full) == 1000
+    assert sorted(first + resumed) == sorted(full)
+
+
+def test_resume_finished_scan_fetches_nothing():
+    message_ids = range(1, 101)
+    scanner = make_scanner(message_ids)
+    collect(scanner.scan(None, limit=50, windows=1))
+    resumed_scanner = make_scanner(message_ids)
+    assert collect(resumed_scanner.resume(None, scanner.covered_ranges(), scanner.floor, scanner.budget)) == []
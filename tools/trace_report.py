@@ -0,0 +1,116 @@
+"""Summarise a span trace: where commands and jobs spend their time
+
+Every instant of a job or command is put in one phase: "rpc" while any of
+its requests is in flight, "scheduler wait" while requests only wait for
+their rate limit or a FloodWait, and "local" otherwise. Concurrent
+requests are counted once, so the phases add up to the wall time.
+
+Usage: python tools/trace_report.py [traces/trace.jsonl ...] [--name cleanup]
+"""
+import argparse
+import json
+import sys
+
+ROOT_KINDS = ('job', 'command')
+PHASES = ('rpc', 'scheduler wait', 'local')
+
+
+def load_spans(paths):
+    spans = {}
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    span = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # A line cut off by a crash
+                spans[span['id']] = span
+    return spans
+
+
+def owner(span, spans):
+    """The nearest job or command span enclosing a span, or None"""
+    parent = spans.get(span['parent'])
+    while parent is not None and parent['kind'] not in ROOT_KINDS:
+        parent = spans.get(parent['parent'])
+    return parent
+
+
+def phase_times(root, children):
+    """Seconds of a root span spent in each phase"""
+    start = root['start']
+    end = start + root['duration']
+    edges = []
+    for child in children:
+        phase = 'rpc' if child['kind'] == 'rpc' else 'scheduler wait'
+        child_start = max(start, child['start'])
+        child_end = min(end, child['start'] + child['duration'])
+        if child_end > child_start:
+            edges.append((child_start, 1, phase))
+            edges.append((child_end, -1, phase))
+    edges.sort(key=lambda edge: (edge[0], edge[1]))
+    
+    times = dict.fromkeys(PHASES, 0.0)
+    active = dict.fromkeys(PHASES, 0)
+    previous = start
+    for time, change, phase in edges + [(end, 0, 'local')]:
+        current = 'rpc' if active['rpc'] else 'scheduler wait' if active['scheduler wait'] else 'local'
+        times[current] += max(0.0, time - previous)
+        previous = max(previous, time)
+        active[phase] += change
+    return times
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def report(spans, name=None):
+    children = {}
+    requests = {}  # method -> ([request durations], [wait durations])
+    for span in spans.values():
+        if span['kind'] in ('rpc', 'rpc.wait'):
+            root = owner(span, spans)
+            if root is not None:
+                children.setdefault(root['id'], []).append(span)
+            durations = requests.setdefault(span['name'], ([], []))
+            durations[span['kind'] == 'rpc.wait'].append(span['duration'])
+    
+    groups = {}  # (kind, name) -> [count, wall seconds, {phase: seconds}]
+    for span in spans.values():
+        if span['kind'] not in ROOT_KINDS or (name and span['name'] != name):
+            continue
+        group = groups.setdefault((span['kind'], span['name']), [0, 0.0, dict.fromkeys(PHASES, 0.0)])
+        group[0] += 1
+        group[1] += span['duration']
+        for phase, seconds in phase_times(span, children.get(span['id'], [])).items():
+            group[2][phase] += seconds
+    
+    print(f"{'span':<24} {'count':>6} {'wall s':>9} " + " ".join(f"{phase:>15}" for phase in PHASES))
+    for (kind, span_name), (count, wall, phases) in sorted(groups.items(), key=lambda item: -item[1][1]):
+        shares = " ".join(f"{seconds:8.1f}s {seconds * 100 / wall if wall else 0:4.0f}%" for seconds in phases.values())
+        print(f"{kind + ' ' + span_name:<24} {count:>6} {wall:>9.1f} {shares}")
+    
+    print(f"\n{'request':<16} {'count':>7} {'total s':>9} {'avg ms':>8} {'p95 ms':>8} {'waited s':>9}")
+    for method, (durations, waits) in sorted(requests.items(), key=lambda item: -sum(item[1][0])):
+        if not durations:
+            continue
+        print(f"{method:<16} {len(durations):>7} {sum(durations):>9.1f} {sum(durations) / len(durations) * 1000:>8.1f} "
+              f"{percentile(durations, 0.95) * 1000:>8.1f} {sum(waits):>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='*', default=['traces/trace.jsonl'], help="trace files to read")
+    parser.add_argument('--name', help="only report jobs/commands with this name, e.g. cleanup")
+    args = parser.parse_args()
+    spans = load_spans(args.paths)
+    if not spans:
+        print("No spans found")
+        sys.exit(1)
+    report(spans, args.name)
+
+
+if __name__ == '__main__':
+    main()
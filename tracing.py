@@ -0,0 +1,128 @@
+"""Lightweight spans for commands, jobs and requests, written as JSON lines"""
+import contextvars
+import itertools
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+_current = contextvars.ContextVar('span', default=None)
+_STOP = object()
+
+
+class Span:
+    """One timed operation; use as a context manager"""
+    __slots__ = ('tracer', 'id', 'parent', 'kind', 'name', 'attrs', 'start', 'started', 'token')
+    
+    def __init__(self, tracer, kind, name, attrs):
+        self.tracer = tracer
+        self.kind = kind
+        self.name = name
+        self.attrs = attrs
+    
+    def set(self, **attrs):
+        """Add attributes known only later, e.g. the outcome of a request"""
+        self.attrs.update(attrs)
+    
+    def __enter__(self):
+        self.id = next(self.tracer.ids)
+        self.parent = _current.get()
+        self.token = _current.set(self.id)
+        self.start = time.time()
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        duration = time.perf_counter() - self.started
+        _current.reset(self.token)
+        if exc_type is not None and 'outcome' not in self.attrs:
+            self.attrs['outcome'] = exc_type.__name__
+        self.tracer.emit(self.id, self.parent, self.kind, self.name, self.start, duration, self.attrs)
+        return False
+
+
+class NullSpan:
+    """Returned while tracing is off; does nothing"""
+    def set(self, **attrs):
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Tracer:
+    """Record spans to a JSONL file from a background writer thread
+
+    Each span line has id, parent (the enclosing span in the same task,
+    inherited by tasks it creates), kind, name, start (epoch seconds),
+    duration (seconds) and any attributes. Off until a path is
+    configured; while off, span() returns a shared no-op object. The
+    file is restarted (previous one kept as .1) when it exceeds max_bytes.
+    """
+    def __init__(self, path=None, max_bytes=20_000_000):
+        # Seeded from the clock so IDs stay unique when a trace file spans restarts
+        self.ids = itertools.count(int(time.time()) * 1_000_000)
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+        self.configure(path, max_bytes)
+    
+    def configure(self, path=None, max_bytes=20_000_000):
+        self.path = path
+        self.max_bytes = max_bytes
+    
+    def span(self, kind, name, **attrs):
+        if self.path is None:
+            return NULL_SPAN
+        return Span(self, kind, name, attrs)
+    
+    def emit(self, span_id, parent, kind, name, start, duration, attrs):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._write_loop, name='trace-writer', daemon=True)
+            self.thread.start()
+        self.queue.put((span_id, parent, kind, name, start, duration, attrs))
+    
+    def _write_loop(self):
+        file = None
+        while True:
+            record = self.queue.get()
+            if record is _STOP:
+                break
+            try:
+                if file is None:
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    file = open(self.path, 'a', encoding='utf-8')
+                span_id, parent, kind, name, start, duration, attrs = record
+                file.write(json.dumps({'id': span_id, 'parent': parent, 'kind': kind, 'name': name,
+                                       'start': round(start, 6), 'duration': round(duration, 6), **attrs},
+                                      default=str) + '\n')
+                if self.queue.empty():
+                    file.flush()
+                    if file.tell() >= self.max_bytes:
+                        file.close()
+                        file = None
+                        os.replace(self.path, f"{self.path}.1")
+            except Exception as e:
+                sys.stderr.write(f"Tracing failed: {str(e)}\n")
+        if file is not None:
+            file.close()
+    
+    def close(self, timeout=5):
+        """Write out every finished span and stop the writer thread"""
+        if self.thread is None:
+            return
+        self.queue.put(_STOP)
+        self.thread.join(timeout)
+        self.thread = None
+
+
+tracer = Tracer()